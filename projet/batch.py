@@ -0,0 +1,311 @@
+import os
+import sys
+import csv
+import json
+import time
+import queue
+import heapq
+import asyncio
+import argparse
+import multiprocessing
+from itertools import groupby
+from inference.engine import InferenceEngine
+from inference.candidates import format_path
+from inference.paths import PathSchema
+from utils.api import MAX_CONCURRENCY, RATE_LIMIT
+from utils.metrics import metrics
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'snapshot')
+
+CSV_FIELDS = ["index", "node_a", "relation", "node_b", "direct_weight", "negated",
+              "candidates", "top_score", "top_path", "incomplete", "error"]
+
+
+def read_triples(stream):
+    """
+    Lit des triplets « nodeA relation nodeB », un par ligne. Les lignes contenant une
+    tabulation sont découpées sur les tabulations (noms composés), les autres sur les espaces.
+    Les lignes vides et les commentaires (#) sont ignorés.
+    """
+    triples = []
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [part.strip() for part in line.split("\t")] if "\t" in line else line.split()
+        if len(parts) != 3:
+            print(f"Ligne ignorée (format invalide) : {line}", file=sys.stderr)
+            continue
+        triples.append((len(triples), *parts))
+    return triples
+
+
+def make_record(index, node_a, relation, node_b, outcome=None, top=10, error=None, with_metrics=False):
+    """
+    Construit l'enregistrement de sortie d'un triplet (les `top` meilleurs chemins seulement).
+    Avec `with_metrics`, le rapport de mesures de la requête est joint sous la clé "metrics" ;
+    les plans d'exécution (requête avec budget de latence) le sont sous la clé "plans".
+    "incomplete" signale des lectures échouées en route (chemins peut-être manquants).
+    """
+    record = {"index": index, "node_a": node_a, "relation": relation, "node_b": node_b,
+              "direct_weight": None, "negated": False, "candidates": 0, "results": [],
+              "incomplete": False, "error": error}
+    if outcome is None:
+        return record
+    if with_metrics:
+        record["metrics"] = outcome["metrics"].to_dict()
+    if "plans" in outcome:
+        record["plans"] = outcome["plans"]
+    if outcome["direct"]:
+        record["direct_weight"] = outcome["direct"][0][1]
+    if outcome["results"] is None:
+        record["negated"] = True
+        return record
+    results = outcome["results"]
+    record["candidates"] = len(results)
+    record["incomplete"] = results.incomplete
+    record["results"] = [{"path": format_path(res), "score": res.score}
+                         for res in results.records(results.top(top))]
+    return record
+
+
+class RecordWriter:
+    """Écrit les enregistrements au fil de l'eau en JSONL ou en CSV (une ligne par triplet)."""
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == "csv":
+            self.writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, record):
+        if self.fmt == "csv":
+            row = {key: record[key] for key in CSV_FIELDS if key in record}
+            best = record["results"][0] if record["results"] else None
+            row["top_score"] = f"{best['score']:.4f}" if best else ""
+            row["top_path"] = best["path"] if best else ""
+            self.writer.writerow(row)
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+async def run_batch(triples, writer, jobs=8, top=10, max_concurrency=MAX_CONCURRENCY, rate_limit=RATE_LIMIT,
+                    snapshot=None, prune=False, schemas=(), with_metrics=False, budget=None):
+    """
+    Évalue tous les triplets et retourne les statistiques de débit.
+
+    Les triplets sont regroupés par node_a (puis node_b) : les préfixes de chemins d'un
+    groupe (voisinages r_isa / r_hypo, ...) sont développés une seule fois avant de lancer
+    ses requêtes et restent mémorisés par le moteur de chemins ; le cache d'arêtes (avec la
+    fusion des appels identiques en vol) sert le reste.
+    Au plus `jobs` triplets sont évalués simultanément. Avec `prune`, le moteur travaille
+    en mode top-k (`top` meilleurs chemins) et « candidates » ne compte que ceux-là.
+    Avec `with_metrics`, chaque enregistrement JSONL porte le rapport de mesures de sa requête.
+    Avec `budget`, chaque triplet est planifié pour tenir en `budget` secondes (voir inference.planner).
+    """
+    start_time = time.time()
+    semaphore = asyncio.Semaphore(jobs)
+    ordered = sorted(triples, key=lambda t: (t[1], t[3], t[2]))
+
+    async with InferenceEngine(max_concurrency, rate_limit, snapshot=snapshot, schemas=schemas) as engine:
+        client = engine.client
+        relations_dict = await client.relation_types()
+
+        async def evaluate(index, node_a, relation, node_b):
+            async with semaphore:
+                if relation not in relations_dict:
+                    return make_record(index, node_a, relation, node_b, error="relation inconnue")
+                try:
+                    outcome = await engine.run(node_a, relation, node_b, top if prune else None, budget)
+                except Exception as exc:
+                    return make_record(index, node_a, relation, node_b, error=str(exc) or type(exc).__name__)
+                return make_record(index, node_a, relation, node_b, outcome, top, with_metrics=with_metrics)
+
+        async def evaluate_group(node_a, group):
+            # Un seul développement des préfixes de chemins (r_isa, r_hypo, ...) pour tout le groupe
+            async with semaphore:
+                await engine.paths.prefetch(node_a, group[0][2], engine.schemas)
+            return await asyncio.gather(*(evaluate(*triple) for triple in group))
+
+        tasks = [asyncio.ensure_future(evaluate_group(node_a, list(group)))
+                 for node_a, group in groupby(ordered, key=lambda t: t[1])]
+        for task in asyncio.as_completed(tasks):
+            for record in await task:
+                writer.write(record)
+        calls = client.calls
+
+    elapsed = time.time() - start_time
+    count = len(triples)
+    return {
+        "triples": count,
+        "elapsed": elapsed,
+        "triples_per_second": count / elapsed if elapsed > 0 else 0.0,
+        "api_calls": calls,
+        "api_calls_per_triple": calls / count if count else 0.0,
+    }
+
+
+def shard_triples(triples, shards):
+    """
+    Répartit les triplets en `shards` parts sans jamais séparer un même node_a : chaque groupe,
+    du plus gros au plus petit, va à la part la moins chargée.
+    """
+    groups = {}
+    for triple in triples:
+        groups.setdefault(triple[1], []).append(triple)
+    parts = [[] for _ in range(shards)]
+    loads = [(0, index) for index in range(shards)]
+    for group in sorted(groups.values(), key=len, reverse=True):
+        load, index = heapq.heappop(loads)
+        parts[index].extend(group)
+        heapq.heappush(loads, (load + len(group), index))
+    return [part for part in parts if part]
+
+
+class QueueWriter:
+    """Writer d'un processus fils : transmet chaque enregistrement au processus parent."""
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def write(self, record):
+        self.messages.put(("record", record))
+
+
+def run_shard(triples, messages, options):
+    """Point d'entrée d'un processus fils : évalue sa part et renvoie ses statistiques et mesures."""
+    try:
+        stats = asyncio.run(run_batch(triples, QueueWriter(messages), **options))
+        messages.put(("done", stats, metrics.state()))
+    except BaseException as exc:
+        messages.put(("error", f"{type(exc).__name__}: {exc}"))
+        raise
+
+
+def run_sharded(triples, writer, processes, jobs=8, top=10, max_concurrency=MAX_CONCURRENCY, rate_limit=RATE_LIMIT,
+                snapshot=None, prune=False, schemas=(), with_metrics=False, budget=None):
+    """
+    Évalue les triplets dans `processes` processus (un moteur, un pool de connexions et une
+    mémoire des préfixes par processus), les triplets d'un même node_a restant dans le même
+    processus. Les enregistrements sont écrits au fil de l'eau, dans l'ordre d'arrivée.
+
+    Les processus sont lancés en mode « spawn » (aucune connexion SQLite ni session héritée) ;
+    ils partagent l'index compact des types de relations et l'instantané, projetés en mémoire
+    depuis les mêmes fichiers. La concurrence HTTP et le débit sont répartis entre processus.
+    """
+    start_time = time.time()
+    shards = shard_triples(triples, processes)
+    options = {
+        "jobs": jobs, "top": top, "snapshot": snapshot, "prune": prune, "schemas": list(schemas),
+        "with_metrics": with_metrics, "budget": budget,
+        "max_concurrency": max(1, max_concurrency // max(1, len(shards))),
+        "rate_limit": rate_limit / len(shards) if rate_limit and shards else rate_limit,
+    }
+    context = multiprocessing.get_context("spawn")
+    messages = context.Queue()
+    workers = [context.Process(target=run_shard, args=(shard, messages, options), daemon=True)
+               for shard in shards]
+    for worker in workers:
+        worker.start()
+
+    calls, remaining, errors = 0, len(workers), []
+    try:
+        while remaining:
+            try:
+                message = messages.get(timeout=1)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    raise RuntimeError("un processus s'est arrêté sans transmettre ses résultats")
+                continue
+            if message[0] == "record":
+                writer.write(message[1])
+            elif message[0] == "done":
+                calls += message[1]["api_calls"]
+                metrics.merge(message[2])
+                remaining -= 1
+            else:
+                errors.append(message[1])
+                remaining -= 1
+    finally:
+        for worker in workers:
+            worker.join()
+    if errors:
+        raise RuntimeError("; ".join(errors))
+
+    elapsed = time.time() - start_time
+    count = len(triples)
+    return {
+        "triples": count,
+        "elapsed": elapsed,
+        "triples_per_second": count / elapsed if elapsed > 0 else 0.0,
+        "api_calls": calls,
+        "api_calls_per_triple": calls / count if count else 0.0,
+        "processes": len(workers),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Évaluation en lot de triplets « nodeA relation nodeB ».")
+    parser.add_argument("input", nargs="?", default="-", help="fichier de triplets ('-' pour l'entrée standard)")
+    parser.add_argument("-o", "--output", default="-", help="fichier de sortie ('-' pour la sortie standard)")
+    parser.add_argument("-f", "--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="triplets évalués simultanément (par processus)")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="nombre de processus (les triplets sont répartis par node_a)")
+    parser.add_argument("--top", type=int, default=10, help="nombre de chemins conservés par triplet")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="nombre maximal de requêtes HTTP simultanées")
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT,
+                        help="requêtes par seconde et par hôte (0 pour désactiver)")
+    parser.add_argument("--snapshot", nargs="?", const=SNAPSHOT_DIR,
+                        help="travailler hors ligne sur un instantané local du graphe")
+    parser.add_argument("--prune", action="store_true",
+                        help="mode top-k : ne garder que les --top meilleurs chemins de chaque schéma")
+    parser.add_argument("--schema", action="append", default=[], type=PathSchema.parse,
+                        help="schéma de chemin supplémentaire, par ex. 'r_isa>r_isa>R' (répétable)")
+    parser.add_argument("--budget", type=float,
+                        help="budget de latence par triplet (s) : le planificateur limite les hubs")
+    parser.add_argument("--query-metrics", action="store_true",
+                        help="joindre à chaque enregistrement JSONL le rapport de mesures de la requête")
+    parser.add_argument("--metrics", help="écrire les mesures agrégées dans ce fichier (JSON, ou texte "
+                                          "Prometheus si le nom finit par .prom)")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        triples = read_triples(sys.stdin)
+    else:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            triples = read_triples(f)
+
+    out = sys.stdout if args.output == "-" else open(args.output, 'w', encoding='utf-8', newline='')
+    try:
+        writer = RecordWriter(out, args.format)
+        if args.processes > 1:
+            stats = run_sharded(triples, writer, args.processes, args.jobs, args.top, args.concurrency,
+                                args.rate_limit, args.snapshot, args.prune, args.schema, args.query_metrics,
+                                args.budget)
+        else:
+            stats = asyncio.run(run_batch(triples, writer, args.jobs, args.top, args.concurrency,
+                                          args.rate_limit, args.snapshot, args.prune, args.schema,
+                                          args.query_metrics, args.budget))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            if args.metrics.endswith(".prom"):
+                f.write(metrics.render_prometheus())
+            else:
+                json.dump({"batch": stats, **metrics.to_dict()}, f, ensure_ascii=False, indent=2)
+
+    print(f"{stats['triples']} triplets en {stats['elapsed']:.2f} s | "
+          f"{stats['triples_per_second']:.2f} triplets/s | "
+          f"{stats['api_calls']} appels API ({stats['api_calls_per_triple']:.2f} par triplet)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import json
+import random
+import asyncio
+import argparse
+from urllib.parse import urlsplit, unquote
+
+from aiohttp import web
+
+from utils.api import ApiClient, BASE_URL
+from utils.decode import loads
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_FILE = os.path.join(script_dir, 'fixtures', 'api.jsonl')
+
+
+def request_key(url):
+    """Clé d'une requête dans les fixtures : chemin (sans le préfixe de version) et paramètres, décodés."""
+    parts = urlsplit(url)
+    path = unquote(parts.path)
+    base_path = urlsplit(BASE_URL).path
+    if path.startswith(base_path):
+        path = path[len(base_path):]
+    return path + ("?" + unquote(parts.query) if parts.query else "")
+
+
+def load_fixtures(path=FIXTURES_FILE):
+    """Lit les réponses enregistrées : clé -> (statut, corps JSON)."""
+    fixtures = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                fixtures[entry["key"]] = (entry["status"], entry["body"])
+    return fixtures
+
+
+class RecordingClient(ApiClient):
+    """
+    ApiClient qui enregistre chaque réponse de l'API (statut et corps) pour la rejouer plus tard.
+    À utiliser avec un cache vide, sans quoi les voisinages déjà en cache ne sont pas enregistrés.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recorded = {}
+
+    async def get_response(self, url, endpoint="other", raw=False, etag=None):
+        status, data = await super().get_response(url, endpoint, raw, etag)
+        self.recorded[request_key(url)] = (status, loads(data[0]) if raw and data is not None else data)
+        return status, data
+
+    def save(self, path=FIXTURES_FILE):
+        """Fusionne les réponses enregistrées avec les fixtures existantes."""
+        fixtures = load_fixtures(path) if os.path.exists(path) else {}
+        fixtures.update(self.recorded)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for key in sorted(fixtures):
+                status, body = fixtures[key]
+                f.write(json.dumps({"key": key, "status": status, "body": body}, ensure_ascii=False) + "\n")
+        return len(fixtures)
+
+
+class ReplayServer:
+    """
+    Remplaçant local de l'API JDM : sert les réponses enregistrées après une latence injectée
+    de `latency` secondes, plus ou moins `jitter`. Les requêtes inconnues reçoivent un 503
+    (erreur transitoire, jamais mise en cache) plutôt qu'un 404 qui vaudrait absence.
+    """
+
+    def __init__(self, fixtures, latency=0.0, jitter=0.0, seed=0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.misses = 0
+        self._runner = None
+        self.base_url = None
+
+    async def handle(self, request):
+        self.requests += 1
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        entry = self.fixtures.get(request_key(str(request.url)))
+        if entry is None:
+            self.misses += 1
+            return web.json_response({"error": "absent des fixtures"}, status=503)
+        status, body = entry
+        return web.json_response(body, status=status)
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self.handle)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Démarre le serveur (port libre par défaut) et retourne l'URL de base à donner à l'ApiClient."""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}{urlsplit(BASE_URL).path}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur local rejouant les réponses enregistrées de l'API JDM.")
+    parser.add_argument("--fixtures", default=FIXTURES_FILE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="latence injectée par requête (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variation aléatoire de la latence (ms)")
+    args = parser.parse_args(argv)
+    server = ReplayServer(load_fixtures(args.fixtures), args.latency / 1000, args.jitter / 1000)
+    web.run_app(server.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import tracemalloc
+from functools import partial
+
+from batch import read_triples
+from bench.replay import RecordingClient, ReplayServer, load_fixtures, FIXTURES_FILE
+from bench.synthetic import SyntheticGraph, SEED
+from inference.direct import direct_inference_async
+from inference.deductive import deductive_inference_async
+from inference.inductive import inductive_inference_async
+from inference.engine import InferenceEngine
+from utils.api import ApiClient, BASE_URL
+from utils.cache import EdgeCache
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CORPUS_FILE = os.path.join(script_dir, 'corpus.txt')
+BASELINE_FILE = os.path.join(script_dir, 'baseline.json')
+
+TOLERANCE = 0.20   # Écart relatif toléré sur le temps et la mémoire avant de signaler une régression
+
+
+# Chaque scénario reçoit le client et retourne la fonction (node_a, relation, node_b) à mesurer ;
+# "engine" garde un seul moteur (et sa mémoire des préfixes) pour tout le corpus, comme batch.py
+SCENARIOS = {
+    "direct": lambda client: partial(direct_inference_async, client),
+    "deductive": lambda client: partial(deductive_inference_async, client),
+    "inductive": lambda client: partial(inductive_inference_async, client),
+    "engine": lambda client: InferenceEngine(client=client).run,
+}
+
+
+async def run_scenario(scenario, triples, base_url, jobs):
+    """
+    Exécute un scénario sur tout le corpus avec un client neuf (cache d'arêtes vide en mémoire,
+    sans limitation de débit) et retourne (temps, appels API, pic mémoire en octets).
+    """
+    semaphore = asyncio.Semaphore(jobs)
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    async with ApiClient(base_url, cache=EdgeCache(":memory:"), rate_limit=None) as client:
+        func = scenario(client)
+
+        async def one(node_a, relation, node_b):
+            async with semaphore:
+                await func(node_a, relation, node_b)
+        await asyncio.gather(*(one(node_a, relation, node_b) for _, node_a, relation, node_b in triples))
+        calls = client.calls
+    elapsed = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, calls, peak
+
+
+async def benchmark(triples, scenarios, fixtures, latency, jitter, repeat, jobs):
+    """Rejoue chaque scénario `repeat` fois contre le serveur local et retourne les mesures (médianes)."""
+    server = ReplayServer(fixtures, latency, jitter)
+    base_url = await server.start()
+    results = {}
+    try:
+        for name in scenarios:
+            runs = [await run_scenario(SCENARIOS[name], triples, base_url, jobs) for _ in range(repeat)]
+            wall = statistics.median(run[0] for run in runs)
+            results[name] = {
+                "wall": wall,
+                "api_calls": runs[0][1],
+                "peak_kb": max(run[2] for run in runs) / 1024,
+                "queries_per_second": len(triples) / wall if wall > 0 else 0.0,
+            }
+    finally:
+        await server.stop()
+    if server.misses:
+        print(f"Attention : {server.misses} requêtes absentes des fixtures (réponse 503).", file=sys.stderr)
+    return results
+
+
+async def record(triples, base_url, path):
+    """Interroge l'API réelle pour tout le corpus et tous les scénarios, et enregistre les réponses."""
+    async with RecordingClient(base_url, cache=EdgeCache(":memory:")) as client:
+        for scenario in SCENARIOS.values():
+            func = scenario(client)
+            for _, node_a, relation, node_b in triples:
+                await func(node_a, relation, node_b)
+        count = client.save(path)
+    print(f"{len(client.recorded)} réponses enregistrées ({count} au total) dans {path}", file=sys.stderr)
+
+
+async def record_synthetic(triples, path, seed=SEED):
+    """Enregistre les fixtures du corpus contre un graphe synthétique (bench.synthetic), sans réseau."""
+    server = ReplayServer(SyntheticGraph(triples, seed))
+    base_url = await server.start()
+    try:
+        await record(triples, base_url, path)
+    finally:
+        await server.stop()
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Affiche les mesures face à la référence et retourne la liste des régressions."""
+    regressions = []
+    print(f"{'scénario':<10} {'temps (s)':>18} {'appels API':>16} {'pic mémoire (ko)':>22} {'requêtes/s':>12}")
+    for name, current in results.items():
+        reference = baseline.get(name)
+
+        def cell(key, fmt):
+            value = format(current[key], fmt)
+            if reference is None or not reference.get(key):
+                return value
+            return f"{value} ({(current[key] / reference[key] - 1) * 100:+.0f}%)"
+
+        print(f"{name:<10} {cell('wall', '.3f'):>18} {cell('api_calls', 'd'):>16} "
+              f"{cell('peak_kb', '.0f'):>22} {current['queries_per_second']:>12.1f}")
+        if reference is None:
+            continue
+        if current["api_calls"] > reference["api_calls"]:
+            regressions.append(f"{name} : {reference['api_calls']} -> {current['api_calls']} appels API")
+        if current["wall"] > reference["wall"] * (1 + tolerance):
+            regressions.append(f"{name} : temps {reference['wall']:.3f} s -> {current['wall']:.3f} s")
+        if current["peak_kb"] > reference["peak_kb"] * (1 + tolerance):
+            regressions.append(f"{name} : mémoire {reference['peak_kb']:.0f} ko -> {current['peak_kb']:.0f} ko")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai reproductible des inférences (API rejouée en local).")
+    parser.add_argument("--corpus", default=CORPUS_FILE, help="fichier de triplets « nodeA relation nodeB »")
+    parser.add_argument("--fixtures", default=FIXTURES_FILE, help="réponses enregistrées de l'API")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="mesures de référence (JSON)")
+    parser.add_argument("--record", action="store_true",
+                        help="enregistrer les réponses de l'API réelle pour le corpus (réseau requis)")
+    parser.add_argument("--api", default=BASE_URL, help="URL de l'API à enregistrer")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="enregistrer les fixtures contre un graphe synthétique déterministe (sans réseau)")
+    parser.add_argument("--seed", type=int, default=SEED, help="graine du graphe synthétique")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scénario à mesurer (répétable, tous par défaut)")
+    parser.add_argument("--latency", type=float, default=20.0, help="latence injectée par requête (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variation aléatoire de la latence (ms)")
+    parser.add_argument("--repeat", type=int, default=3, help="répétitions par scénario (médiane du temps)")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="requêtes évaluées simultanément")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="écart relatif toléré")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistrer ces mesures comme référence")
+    args = parser.parse_args(argv)
+
+    with open(args.corpus, 'r', encoding='utf-8') as f:
+        triples = read_triples(f)
+    if args.record:
+        asyncio.run(record(triples, args.api, args.fixtures))
+        return
+    if args.synthetic:
+        asyncio.run(record_synthetic(triples, args.fixtures, args.seed))
+        return
+    if not os.path.exists(args.fixtures):
+        parser.error(f"fixtures introuvables ({args.fixtures}) : lancer d'abord avec --record ou --synthetic")
+
+    results = asyncio.run(benchmark(triples, args.scenario or list(SCENARIOS), load_fixtures(args.fixtures),
+                                    args.latency / 1000, args.jitter / 1000, args.repeat, args.jobs))
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Référence enregistrée dans {args.baseline}", file=sys.stderr)
+    elif regressions:
+        print("\nRégressions :", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
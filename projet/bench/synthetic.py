@@ -0,0 +1,82 @@
+import random
+from urllib.parse import urlsplit, parse_qs
+
+from utils.relations import index_relation_types, load_relation_types
+
+SEED = 0
+GENERICS = 12      # Génériques (r_isa) et spécifiques (r_hypo) de chaque node_a du corpus
+SPECIFICS = 40
+LINK_RATE = 0.4    # Part des intermédiaires reliés à node_b par la relation demandée
+NEGATIVE_RATE = 0.1
+
+
+class SyntheticGraph:
+    """
+    Graphe JDM synthétique et déterministe construit autour d'un corpus de triplets : chaque
+    node_a reçoit des génériques et des spécifiques, dont une partie est reliée à node_b par la
+    relation demandée (parfois avec un poids négatif), plus quelques relations directes.
+
+    Il se substitue aux fixtures d'un ReplayServer (même méthode get(clé) -> (statut, corps)) :
+    enregistrer le corpus contre ce serveur produit des fixtures sans réseau, de même forme
+    que celles de l'API réelle.
+    """
+
+    def __init__(self, triples, seed=SEED, relation_types=None):
+        types = index_relation_types(relation_types if relation_types is not None else load_relation_types())
+        rng = random.Random(seed)
+        self.ids = {}
+        self.edges = {}  # (source, cible, type) -> poids
+        isa, hypo = types["r_isa"]["id"], types["r_hypo"]["id"]
+        for _, node_a, relation, node_b in triples:
+            type_id = types[relation]["id"]
+            self._node(node_b)
+            for kind, type_hop, count in (("g", isa, GENERICS), ("s", hypo, SPECIFICS)):
+                for i in range(count):
+                    middle = f"{node_a}:{kind}{i}"
+                    self._add(node_a, middle, type_hop, rng.randint(1, 120))
+                    if rng.random() < LINK_RATE:
+                        weight = rng.randint(1, 80) if rng.random() >= NEGATIVE_RATE else -rng.randint(1, 40)
+                        self._add(middle, node_b, type_id, weight)
+            if rng.random() < 0.5:
+                self._add(node_a, node_b, type_id, rng.randint(1, 100) if rng.random() >= NEGATIVE_RATE
+                          else -rng.randint(1, 20))
+
+    def _node(self, name):
+        return self.ids.setdefault(name, len(self.ids) + 1000)
+
+    def _add(self, source, target, type_id, weight):
+        self._node(source)
+        self._node(target)
+        self.edges[(source, target, type_id)] = weight
+
+    def _body(self, edges):
+        names = {name for source, target, _ in edges for name in (source, target)}
+        return {
+            "nodes": [{"id": self.ids[name], "name": name, "type": 1, "w": 50} for name in sorted(names)],
+            "relations": [{"id": index + 1, "node1": self.ids[source], "node2": self.ids[target], "type": type_id,
+                           "w": self.edges[(source, target, type_id)]}
+                          for index, (source, target, type_id) in enumerate(edges)],
+        }
+
+    def get(self, key):
+        """Réponse (statut, corps JSON) à une requête /relations, ou None si le point d'accès est inconnu."""
+        parts = urlsplit(key)
+        path = parts.path.strip("/").split("/")
+        query = parse_qs(parts.query)
+        types = {int(t) for t in query.get("types_ids", [""])[0].split(",") if t}
+        min_weight = float(query["min_weight"][0]) if "min_weight" in query else None
+        if path[0] != "relations" or len(path) not in (3, 5):
+            return None
+        nodes = path[2::2]
+        if any(name not in self.ids for name in nodes):
+            return 404, {}
+        if len(path) == 5:
+            match = lambda source, target: source == nodes[0] and target == nodes[1]
+        elif path[1] == "from":
+            match = lambda source, target: source == nodes[0]
+        else:
+            match = lambda source, target: target == nodes[0]
+        edges = sorted(edge for edge, weight in self.edges.items()
+                       if match(edge[0], edge[1]) and (not types or edge[2] in types)
+                       and (min_weight is None or weight >= min_weight))
+        return 200, self._body(edges)
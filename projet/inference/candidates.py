@@ -0,0 +1,123 @@
+import numpy as np
+from utils.intern import node_table
+from utils.normalize import top_k_indices
+
+
+def format_path(res):
+    """« a r1 x & x r2 b » (un maillon par saut) à partir d'un Candidate."""
+    nodes = [res.node_a, *res.intermediates, res.node_b]
+    return " & ".join(f"{nodes[i]} {relation} {nodes[i + 1]}" for i, relation in enumerate(res.relations))
+
+
+class Candidate:
+    """Ligne d'un CandidateSet prête à l'affichage : chemin node_a -> intermédiaires -> node_b et score."""
+
+    __slots__ = ("node_a", "relations", "intermediates", "node_b", "score")
+
+    def __init__(self, node_a, relations, intermediates, node_b, score):
+        self.node_a = node_a
+        self.relations = relations
+        self.intermediates = intermediates
+        self.node_b = node_b
+        self.score = score
+
+    # Premier intermédiaire et relations extrêmes (le chemin entier pour deux sauts)
+    @property
+    def first_relation(self):
+        return self.relations[0]
+
+    @property
+    def intermediate_node(self):
+        return self.intermediates[0]
+
+    @property
+    def second_relation(self):
+        return self.relations[-1]
+
+
+class CandidateSet:
+    """
+    Candidats d'une requête stockés en colonnes (un tableau NumPy par champ) :
+    la normalisation et le score sont vectorisés, et les enregistrements d'affichage
+    ne sont construits que pour les lignes demandées (records).
+
+    Chaque ligne est un chemin node_a -> intermédiaires -> node_b ; `kinds` renvoie
+    au schéma (suite de noms de relations) qui l'a produit. Les intermédiaires sont une
+    matrice d'identifiants internés (utils.intern), complétée par -1 pour les chemins courts.
+    `incomplete` signale qu'une lecture a échoué en route : des chemins peuvent manquer.
+    """
+
+    def __init__(self, node_a, second_relation, node_b, schemas=(),
+                 kinds=None, intermediate_ids=None, intermediates=None, weights=None,
+                 final_weights=None, scores=None, incomplete=False):
+        self.node_a = node_a
+        self.second_relation = second_relation
+        self.node_b = node_b
+        self.schemas = list(schemas)                   # kind -> noms des relations du chemin
+        self.kinds = np.zeros(0, dtype=np.uint8) if kinds is None else kinds
+        # Dernier intermédiaire (celui relié à node_b) et chemin complet des intermédiaires
+        self.intermediate_ids = np.zeros(0, dtype=np.int64) if intermediate_ids is None else intermediate_ids
+        self.intermediates = np.zeros((0, 1), dtype=np.int32) if intermediates is None else intermediates
+        self.weights = np.zeros(0) if weights is None else weights                 # poids du premier saut
+        self.final_weights = np.zeros(0) if final_weights is None else final_weights  # poids du dernier saut
+        self.scores = np.zeros(0) if scores is None else scores
+        self.incomplete = incomplete
+
+    @classmethod
+    def concat(cls, sets, node_a, second_relation, node_b):
+        """Réunit plusieurs ensembles d'une même requête (par exemple déductif et inductif)."""
+        sets = [candidates for candidates in sets if candidates is not None]
+        if not sets:
+            return cls(node_a, second_relation, node_b)
+        schemas, kinds = [], []
+        for candidates in sets:
+            kinds.append(candidates.kinds + len(schemas))
+            schemas.extend(candidates.schemas)
+        # Schémas de longueurs différentes : chemins complétés par -1 jusqu'à la plus grande largeur
+        width = max(c.intermediates.shape[1] for c in sets)
+        intermediates = np.concatenate([
+            np.pad(c.intermediates, ((0, 0), (0, width - c.intermediates.shape[1])), constant_values=-1)
+            for c in sets
+        ])
+        return cls(node_a, second_relation, node_b, schemas,
+                   np.concatenate(kinds).astype(np.uint8),
+                   np.concatenate([c.intermediate_ids for c in sets]),
+                   intermediates,
+                   np.concatenate([c.weights for c in sets]),
+                   np.concatenate([c.final_weights for c in sets]),
+                   np.concatenate([c.scores for c in sets]),
+                   any(c.incomplete for c in sets))
+
+    def take(self, indices):
+        """Sous-ensemble des lignes `indices` (dans cet ordre)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        return CandidateSet(self.node_a, self.second_relation, self.node_b, self.schemas,
+                            self.kinds[indices], self.intermediate_ids[indices],
+                            self.intermediates[indices], self.weights[indices],
+                            self.final_weights[indices], self.scores[indices], self.incomplete)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def top(self, k=None):
+        """Indices des k meilleurs candidats (tous si k vaut None), par score décroissant."""
+        return top_k_indices(self.scores, k)
+
+    def top_per_schema(self, k):
+        """
+        Indices des k meilleurs candidats de chaque schéma, mis bout à bout dans l'ordre des
+        schémas : la troncature qu'applique PathInference.evaluate en mode top-k avant l'union.
+        """
+        parts = []
+        for kind in range(len(self.schemas)):
+            indices = np.flatnonzero(self.kinds == kind)
+            parts.append(indices[top_k_indices(self.scores[indices], k)])
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def records(self, indices=None):
+        """Enregistrements d'affichage (Candidate) des lignes `indices` (toutes, dans l'ordre, si None)."""
+        if indices is None:
+            indices = range(len(self))
+        return [Candidate(self.node_a, self.schemas[self.kinds[i]], node_table.names(self.intermediates[i]),
+                          self.node_b, float(self.scores[i]))
+                for i in indices]
@@ -1,30 +1,14 @@
-import requests
-from functools import lru_cache
+from utils.api import run_with_client
+from utils.source import SourceError
 
-BASE_URL = "https://jdm-api.demo.lirmm.fr/v0"
-session = requests.Session()  # Réutilise les connexions HTTP
 
-@lru_cache(maxsize=32)
-def get_relation_types():
-    """Récupère et met en cache tous les types de relations disponibles."""
-    url = f"{BASE_URL}/relations_types"
-    response = session.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        relations_dict = {rel["id"]: rel for rel in data}      # Index par ID
-        relations_dict.update({rel["name"]: rel for rel in data})  # Index par nom
-        relations_dict.update({rel["gpname"]: rel for rel in data})  # Index par gpname
-        return relations_dict
-    else:
-        print("Erreur lors de la récupération des types de relations.")
-        return {}
-
-def direct_inference(node_a, relation, node_b):
+async def direct_inference_async(client, node_a, relation, node_b):
     """
     Effectue une inférence directe entre node_a et node_b pour un type de relation donné
     (identifié par son name ou gpname) et retourne une liste de tuples (node_a, poids).
+    Lève SourceError si la source n'a pas pu répondre (une liste vide signifie une absence).
     """
-    relations_dict = get_relation_types()
+    relations_dict = await client.relation_types()
     relation_info = relations_dict.get(relation)
     
     if not relation_info:
@@ -36,18 +20,16 @@ def direct_inference(node_a, relation, node_b):
         print(f"Erreur: ID non trouvé pour la relation '{relation}'")
         return []
     
-    url = f"{BASE_URL}/relations/from/{node_a}/to/{node_b}?types_ids={relation_id}"
-    response = session.get(url)
-    
-    if response.status_code != 200:
-        return []
-    
-    data = response.json()
-    relations = data.get("relations", [])
-    results = [(node_a, rel.get("w", 0)) for rel in relations]
+    edges = await client.relations_between(node_a, node_b, relation_id)
+    if edges is None:
+        raise SourceError(f"relation directe {node_a} -> {node_b} inconnue : requête échouée")
     
-    print(results)
+    results = [(node_a, weight) for _, _, weight in edges]
     return results
 
+
+def direct_inference(node_a, relation, node_b):
+    return run_with_client(direct_inference_async, node_a, relation, node_b)
+
 # Exemple d'utilisation :
 # direct_inference("kiwi", "r_agent-1", "voler")
@@ -0,0 +1,170 @@
+import asyncio
+import time
+from utils.api import ApiClient, MAX_CONCURRENCY, RATE_LIMIT
+from utils.metrics import query_report, timer, inc
+from utils.intern import node_table
+from utils.snapshot import SnapshotSource
+from inference.direct import direct_inference_async
+from inference.candidates import CandidateSet
+from inference.materialized import config_key
+from inference.paths import PathInference, DEDUCTIVE, INDUCTIVE, MAX_DEPTH
+
+
+class InferenceEngine:
+    """
+    Moteur d'inférence asynchrone : partage une seule source de données entre toutes
+    les requêtes et exécute l'étape directe en même temps que l'évaluation des schémas
+    de chemins (déduction et induction par défaut, plus les `schemas` supplémentaires).
+
+    Par défaut la source est l'ApiClient (pool de connexions, limite de concurrence,
+    limitation de débit) ; avec `snapshot`, c'est l'instantané local du graphe (hors ligne).
+    Le moteur de chemins, et donc sa mémoire des préfixes déjà développés, vit aussi
+    longtemps que le moteur.
+
+    Avec `index` (inference.materialized.MaterializedIndex), les triplets précalculés pour la
+    même configuration sont servis directement depuis l'index, sans inférence.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, rate_limit=RATE_LIMIT, client=None, snapshot=None,
+                 schemas=(), max_depth=MAX_DEPTH, beam_width=None, index=None):
+        if client is None and snapshot is not None:
+            client = SnapshotSource(snapshot)
+        self.client = client or ApiClient(max_concurrency=max_concurrency, rate_limit=rate_limit)
+        self.schemas = [DEDUCTIVE, INDUCTIVE, *schemas]
+        self.paths = PathInference(self.client, max_depth=max_depth, beam_width=beam_width)
+        self.index = index
+        self.config = config_key(self.schemas, max_depth, beam_width)
+
+    async def __aenter__(self):
+        await self.client.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.close()
+
+    async def _timed(self, coro, stage):
+        start_time = time.time()
+        with timer(stage):
+            result = await coro
+        return result, time.time() - start_time
+
+    def lookup(self, node_a, relation, node_b, top_k=None):
+        """Réponse précalculée (direct, CandidateSet ou None si négation) de l'index, ou None si absente."""
+        if self.index is None:
+            return None
+        with timer("index"):
+            entry = self.index.get(node_a, relation, node_b, self.config)
+        inc("index_hits" if entry is not None else "index_misses")
+        if entry is None:
+            return None
+        direct_results, results = entry
+        if results is not None and top_k is not None:
+            # Même troncature que l'évaluation en mode top-k (par schéma, puis sur l'union)
+            results = results.take(results.top_per_schema(top_k))
+            results = results.take(results.top(top_k))
+        return direct_results, results
+
+    async def run(self, node_a, relation, node_b, top_k=None, budget=None):
+        """
+        Lance l'étape directe et les schémas de chemins en parallèle et retourne un dictionnaire
+        {"direct", "results", "times", "metrics"}, "results" étant un CandidateSet et "metrics"
+        le rapport (utils.metrics.Metrics) de la requête. Si la relation directe existe avec
+        un poids négatif, l'évaluation des chemins est annulée et "results" vaut None.
+
+        Avec `top_k`, chaque schéma ne garde que ses k meilleurs candidats (les scores étant
+        normalisés par schéma, le top-k global en fait forcément partie), puis l'union est tronquée.
+
+        Avec `budget` (secondes), le planificateur (inference.planner) limite le premier saut de
+        chaque schéma et le compromis retenu est rendu sous "plans" (nom du schéma -> dictionnaire).
+        Un triplet présent dans l'index est servi sans inférence ("times" vaut alors {"index": ...}).
+        """
+        with query_report() as report, timer("query"), node_table.pinned():
+            inc("queries")
+            start_time = time.time()
+            hit = self.lookup(node_a, relation, node_b, top_k)
+            if hit is not None:
+                if hit[1] is None:
+                    inc("negated")
+                return {"direct": hit[0], "results": hit[1], "times": {"index": time.time() - start_time},
+                        "metrics": report}
+            plans = await self.paths.plan(node_a, relation, node_b, self.schemas, budget) if budget else None
+            # Les tâches copient le contexte courant : leurs mesures vont dans le rapport de la requête
+            direct = asyncio.ensure_future(
+                self._timed(direct_inference_async(self.client, node_a, relation, node_b), "direct"))
+            paths = asyncio.ensure_future(
+                self._timed(self.paths.evaluate(node_a, relation, node_b, self.schemas, top_k, plans), "paths"))
+            try:
+                direct_results, direct_time = await direct
+                if direct_results and direct_results[0][1] < 0:
+                    paths.cancel()
+                    await asyncio.gather(paths, return_exceptions=True)
+                    inc("negated")
+                    return self._outcome({"direct": direct_results, "results": None,
+                                          "times": {"direct": direct_time}, "metrics": report}, plans)
+                results, paths_time = await paths
+            except BaseException:
+                for task in (direct, paths):
+                    task.cancel()
+                raise
+        return self._outcome({
+            "direct": direct_results,
+            "results": results,
+            "times": {"direct": direct_time, "paths": paths_time},
+            "metrics": report,
+        }, plans)
+
+    @staticmethod
+    def _outcome(outcome, plans):
+        if plans is not None:
+            outcome["plans"] = {name: plan.to_dict() for name, plan in plans.items()}
+        return outcome
+
+    async def stream(self, node_a, relation, node_b, top_k=10, budget=None):
+        """
+        Version progressive de run : générateur asynchrone de dictionnaires
+        {"direct", "results", "final", "elapsed"}, "results" étant le top-k provisoire
+        (CandidateSet) et "direct" None tant que l'étape directe n'a pas répondu.
+        Le dernier dictionnaire (final vaut True) porte le résultat définitif ; une relation
+        directe négative arrête le flux avec "results" à None. Sortir de la boucle annule la requête.
+        Avec `budget`, le dernier dictionnaire porte aussi "plans" (voir run).
+        """
+        # La table d'internement reste épinglée tant que le flux est ouvert (résultats provisoires compris)
+        with node_table.pinned():
+            updates = self._stream(node_a, relation, node_b, top_k, budget)
+            try:
+                async for update in updates:
+                    yield update
+            finally:
+                await updates.aclose()
+
+    async def _stream(self, node_a, relation, node_b, top_k, budget):
+        start_time = time.time()
+        inc("queries")
+        hit = self.lookup(node_a, relation, node_b, top_k)
+        if hit is not None:
+            if hit[1] is None:
+                inc("negated")
+            yield {"direct": hit[0], "results": hit[1], "final": True, "elapsed": time.time() - start_time}
+            return
+        plans = await self.paths.plan(node_a, relation, node_b, self.schemas, budget) if budget else None
+        direct = asyncio.ensure_future(direct_inference_async(self.client, node_a, relation, node_b))
+        updates = self.paths.stream(node_a, relation, node_b, self.schemas, top_k, plans)
+        try:
+            results, done = CandidateSet(node_a, relation, node_b), True  # Cas sans aucun schéma
+            async for results, done in updates:
+                if not done:
+                    direct_results = direct.result() if direct.done() else None
+                    if not (direct_results and direct_results[0][1] < 0):
+                        yield {"direct": direct_results, "results": results, "final": False,
+                               "elapsed": time.time() - start_time}
+                        continue
+                break
+            direct_results = await direct
+            if direct_results and direct_results[0][1] < 0:
+                inc("negated")
+                results = None
+            yield self._outcome({"direct": direct_results, "results": results, "final": True,
+                                 "elapsed": time.time() - start_time}, plans)
+        finally:
+            direct.cancel()
+            await updates.aclose()
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+
+from inference.candidates import CandidateSet
+from utils.intern import node_table
+from utils.source import DataSource
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_FILE = os.path.join(script_dir, 'data', 'materialized.sqlite')
+
+
+def config_key(schemas, max_depth, beam_width):
+    """Configuration du moteur de chemins dont dépendent les résultats (schémas, profondeur, faisceau)."""
+    return ";".join(">".join(schema.relations) for schema in schemas) + f";depth={max_depth};beam={beam_width}"
+
+
+def edges_digest(edges):
+    """Empreinte d'un voisinage [id, nom, poids] (indépendante de l'ordre), ou None s'il n'a pas pu être lu."""
+    if edges is None:
+        return None
+    raw = json.dumps(sorted(map(tuple, edges)), ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def encode_entry(direct, candidates):
+    """
+    Sérialise la réponse d'un triplet : poids directs et, sauf relation directe négative,
+    les colonnes du CandidateSet (intermédiaires par nom, les identifiants internés
+    n'ayant de sens que dans un processus).
+    """
+    payload = {"direct": direct}
+    if not (direct and direct[0] < 0):
+        candidates = candidates if candidates is not None else CandidateSet(None, None, None)
+        payload.update({
+            "schemas": candidates.schemas,
+            "kinds": candidates.kinds.tolist(),
+            "ids": candidates.intermediate_ids.tolist(),
+            "intermediates": [node_table.names(row) for row in candidates.intermediates.tolist()],
+            "weights": candidates.weights.tolist(),
+            "finals": candidates.final_weights.tolist(),
+            "scores": candidates.scores.tolist(),
+        })
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_entry(node_a, relation, node_b, raw):
+    """Inverse de encode_entry : (résultats directs [(node_a, poids)], CandidateSet ou None si négation)."""
+    payload = json.loads(raw)
+    direct = [(node_a, weight) for weight in payload["direct"]]
+    if "scores" not in payload:
+        return direct, None
+    rows = payload["intermediates"]
+    intermediates = np.full((len(rows), max((len(row) for row in rows), default=1)), -1, dtype=np.int32)
+    for i, row in enumerate(rows):
+        intermediates[i, :len(row)] = node_table.intern_many(row)
+    return direct, CandidateSet(
+        node_a, relation, node_b, [tuple(names) for names in payload["schemas"]],
+        np.asarray(payload["kinds"], dtype=np.uint8), np.asarray(payload["ids"], dtype=np.int64), intermediates,
+        np.asarray(payload["weights"], dtype=np.float64), np.asarray(payload["finals"], dtype=np.float64),
+        np.asarray(payload["scores"], dtype=np.float64)
+    )
+
+
+class DependencyRecorder(DataSource):
+    """
+    Source transparente qui garde l'empreinte de chaque voisinage sortant lu : ce sont les
+    dépendances d'une matérialisation (PathInference.materialize ne lit que des voisinages sortants).
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.remote = source.remote
+        self.reads = {}  # (nœud, type, poids minimal) -> empreinte
+
+    async def relation_types(self):
+        return await self.source.relation_types()
+
+    async def relations_from(self, node, type_id, min_weight=None):
+        edges = await self.source.relations_from(node, type_id, min_weight)
+        self.reads[(node, type_id, min_weight)] = edges_digest(edges)
+        return edges
+
+    async def relations_to(self, node, type_id, min_weight=None):
+        return await self.source.relations_to(node, type_id, min_weight)
+
+    def on_change(self, callback):
+        self.source.on_change(callback)
+
+    async def relations_between(self, node_a, node_b, type_id):
+        return await self.source.relations_between(node_a, node_b, type_id)
+
+
+class MaterializedIndex:
+    """
+    Index persistant (SQLite) des inférences précalculées pour les couples (node_a, relation)
+    les plus demandés, avec une entrée par (node_a, relation, node_b) atteignable.
+
+    Un couple est matérialisé pour une configuration du moteur (config_key) ; ses dépendances
+    (empreinte de chaque voisinage lu) permettent de ne recalculer que les couples dont une
+    arête a changé, puis de ne réécrire que les entrées dont la réponse a changé.
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pairs (
+                node_a TEXT NOT NULL,
+                relation TEXT NOT NULL,
+                config TEXT NOT NULL,
+                computed_at REAL NOT NULL,
+                checked_at REAL NOT NULL,
+                PRIMARY KEY (node_a, relation)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                node_a TEXT NOT NULL,
+                relation TEXT NOT NULL,
+                node_b TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (node_a, relation, node_b)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS dependencies (
+                node_a TEXT NOT NULL,
+                relation TEXT NOT NULL,
+                node TEXT NOT NULL,
+                type_id INTEGER NOT NULL,
+                min_weight TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (node_a, relation, node, type_id, min_weight)
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, node_a, relation, node_b, config):
+        """Réponse précalculée (voir decode_entry), ou None si le triplet n'est pas dans l'index."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT e.payload FROM entries e JOIN pairs p ON p.node_a = e.node_a AND p.relation = e.relation "
+                "WHERE e.node_a=? AND e.relation=? AND e.node_b=? AND p.config=?",
+                (node_a, relation, node_b, config)
+            ).fetchone()
+        if row is None:
+            return None
+        return decode_entry(node_a, relation, node_b, row[0])
+
+    def pairs(self):
+        """Couples matérialisés : (node_a, relation, config, calculé le, vérifié le)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT node_a, relation, config, computed_at, checked_at FROM pairs ORDER BY node_a, relation"
+            ).fetchall()
+
+    def dependencies(self, node_a, relation):
+        """Voisinages lus pour matérialiser le couple : (nœud, type, poids minimal, empreinte)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT node, type_id, min_weight, digest FROM dependencies WHERE node_a=? AND relation=?",
+                (node_a, relation)
+            ).fetchall()
+        return [(node, type_id, json.loads(min_weight), digest) for node, type_id, min_weight, digest in rows]
+
+    def watched(self):
+        """
+        Dépendances de tous les couples, regroupées par voisinage : (nœud, type, poids minimal)
+        -> [(node_a, relation, empreinte)]. Un voisinage partagé par plusieurs couples n'est ainsi relu qu'une fois.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT node_a, relation, node, type_id, min_weight, digest FROM dependencies"
+            ).fetchall()
+        watched = {}
+        for node_a, relation, node, type_id, min_weight, digest in rows:
+            watched.setdefault((node, type_id, json.loads(min_weight)), []).append((node_a, relation, digest))
+        return watched
+
+    def store(self, node_a, relation, config, entries, reads):
+        """
+        Enregistre la matérialisation d'un couple (entries : node_b -> réponse sérialisée,
+        reads : dépendances) en ne touchant qu'aux entrées modifiées.
+        Retourne (entrées écrites, entrées supprimées).
+        """
+        now = time.time()
+        with self._lock:
+            current = dict(self._conn.execute(
+                "SELECT node_b, payload FROM entries WHERE node_a=? AND relation=?", (node_a, relation)
+            ).fetchall())
+            written = [(node_a, relation, node_b, payload) for node_b, payload in entries.items()
+                       if current.get(node_b) != payload]
+            deleted = [(node_a, relation, node_b) for node_b in current if node_b not in entries]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (node_a, relation, node_b, payload) VALUES (?, ?, ?, ?)", written)
+            self._conn.executemany("DELETE FROM entries WHERE node_a=? AND relation=? AND node_b=?", deleted)
+            self._conn.execute("DELETE FROM dependencies WHERE node_a=? AND relation=?", (node_a, relation))
+            self._conn.executemany(
+                "INSERT INTO dependencies (node_a, relation, node, type_id, min_weight, digest) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(node_a, relation, node, int(type_id), json.dumps(min_weight), digest)
+                 for (node, type_id, min_weight), digest in reads.items()]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pairs (node_a, relation, config, computed_at, checked_at) VALUES (?, ?, ?, ?, ?)",
+                (node_a, relation, config, now, now)
+            )
+            self._conn.commit()
+        return len(written), len(deleted)
+
+    def touch(self, node_a, relation):
+        """Note qu'un couple a été vérifié sans changement."""
+        with self._lock:
+            self._conn.execute("UPDATE pairs SET checked_at=? WHERE node_a=? AND relation=?",
+                               (time.time(), node_a, relation))
+            self._conn.commit()
+
+    def remove(self, node_a, relation):
+        with self._lock:
+            for table in ("entries", "dependencies", "pairs"):
+                self._conn.execute(f"DELETE FROM {table} WHERE node_a=? AND relation=?", (node_a, relation))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,424 @@
+import re
+import time
+import asyncio
+from collections import OrderedDict
+
+import numpy as np
+
+from inference.candidates import CandidateSet
+from inference.planner import QueryPlanner
+from inference.topk import last_hop_weights, stream_last_hop_weights
+from utils.intern import node_table
+from utils.metrics import inc, timer
+from utils.normalize import normalize, path_scores
+from utils.source import SourceError
+
+MAX_DEPTH = 3          # Nombre maximal de sauts d'un schéma
+MIN_WEIGHT = 1         # Poids minimal des sauts intermédiaires
+MEMO_SIZE = 1024       # Préfixes de chemins gardés en mémoire (toutes requêtes confondues)
+MEMO_TTL = 3600        # Durée de vie (s) d'un préfixe mémorisé, pour les processus longue durée
+
+
+class PathSchema:
+    """
+    Schéma d'inférence : suite de relations allant de node_a à node_b.
+    "R" désigne la relation demandée et "R-1" son inverse (r_x <-> r_x-1).
+    Exemples : PathSchema("r_isa", "R") (déduction), PathSchema("r_isa", "r_isa", "R"),
+    PathSchema("r_syn", "R"), PathSchema("R", "R") (transitivité).
+    """
+
+    def __init__(self, *relations, name=None):
+        if len(relations) < 2:
+            raise ValueError("Un schéma comporte au moins deux relations.")
+        self.relations = tuple(relations)
+        self.name = name or "→".join(relations)
+
+    @classmethod
+    def parse(cls, text):
+        """Lit un schéma écrit « r_isa→r_isa→R » (ou avec '>' / ',' comme séparateur)."""
+        return cls(*[part.strip() for part in re.split(r"→|>|,", text) if part.strip()])
+
+    def resolve(self, relation):
+        """Noms concrets des relations pour la relation demandée."""
+        inverse = relation[:-2] if relation.endswith("-1") else relation + "-1"
+        return tuple(relation if r == "R" else inverse if r == "R-1" else r for r in self.relations)
+
+    def __repr__(self):
+        return f"PathSchema({self.name})"
+
+
+DEDUCTIVE = PathSchema("r_isa", "R", name="deductive")
+INDUCTIVE = PathSchema("r_hypo", "R", name="inductive")
+
+
+class Frontier:
+    """
+    Chemins issus de node_a pour un préfixe de relations, en colonnes : identifiant JDM et
+    identifiant interné (utils.intern) du dernier nœud atteint, matrice des intermédiaires
+    parcourus (internés, dernier nœud compris), poids bruts du premier saut et poids
+    normalisés de chaque saut. `unknown` compte les voisinages dont la lecture a échoué
+    en construisant le préfixe : les chemins qui en partaient manquent.
+    """
+
+    def __init__(self, end_ids, end_nodes, paths, first_weights, norms, unknown=0):
+        self.end_ids = end_ids
+        self.end_nodes = end_nodes
+        self.paths = paths
+        self.first_weights = first_weights
+        self.norms = norms
+        self.unknown = unknown
+
+    def ends(self):
+        """Liste [id, nom] des derniers nœuds, pour les appels du dernier saut."""
+        return [[node_id, node_table.name(node)] for node_id, node in zip(self.end_ids.tolist(), self.end_nodes)]
+
+    def take(self, indices):
+        return Frontier(self.end_ids[indices], self.end_nodes[indices], self.paths[indices],
+                        self.first_weights[indices], self.norms[indices], self.unknown)
+
+    def __len__(self):
+        return len(self.end_ids)
+
+
+class PathInference:
+    """
+    Moteur d'inférence par chemins : évalue plusieurs schémas en une passe.
+
+    Les préfixes communs (par exemple « kiwi r_isa » pour r_isa→R et r_isa→r_isa→R) ne
+    sont développés qu'une fois : chaque Frontier est mémorisée par (node_a, préfixe) et
+    partagée entre schémas, requêtes simultanées et requêtes successives. Un voisinage relu
+    et trouvé changé par la source (DataSource.on_change) retire les préfixes qui l'ont lu ;
+    la mémoire est vidée quand la table d'internement change de génération (utils.intern).
+    À chaque saut intermédiaire, les poids sont normalisés sur l'ensemble des arêtes du
+    niveau ; le dernier saut est normalisé sur les chemins qui atteignent node_b. Le score
+    est la moyenne harmonique des poids normalisés (identique à l'historique à deux sauts).
+
+    Avec un plan (inference.planner), le premier saut ne garde que les arêtes d'un poids
+    au moins égal à plan.min_weight, filtrées avant tout traitement (et dès l'API si plan.upstream),
+    puis normalisées entre elles ; chaque niveau garde au plus plan.max_fanout chemins.
+    """
+
+    def __init__(self, client, max_depth=MAX_DEPTH, beam_width=None, min_weight=MIN_WEIGHT, memo_size=MEMO_SIZE,
+                 memo_ttl=MEMO_TTL):
+        self.client = client
+        self.max_depth = max_depth
+        self.beam_width = beam_width
+        self.min_weight = min_weight
+        self.memo_size = memo_size
+        self.memo_ttl = memo_ttl
+        self.planner = QueryPlanner(client, min_weight)
+        self._memo = OrderedDict()  # (node_a, préfixe, plan) -> (future, date de création)
+        self._generation = node_table.generation  # Génération des identifiants internés de la mémoire
+        client.on_change(self._forget)
+
+    async def frontier(self, node_a, prefix, plan=None):
+        """Frontier du préfixe `prefix` (tuple d'identifiants de relations) depuis node_a."""
+        key = (node_a, prefix, plan.key if plan is not None else None)
+        self._check_generation()
+        entry = self._memo.get(key)
+        if entry is not None and time.monotonic() - entry[1] <= self.memo_ttl:
+            self._memo.move_to_end(key)
+            inc("memo_hits")
+            return await asyncio.shield(entry[0])
+        inc("memo_misses")
+        future = asyncio.ensure_future(self._pinned_expand(node_a, prefix, plan))
+        # L'issue est traitée par le rappel, même si plus personne n'attend le développement
+        future.add_done_callback(lambda done: self._settled(key, done))
+        self._memo[key] = (future, time.monotonic())
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return await asyncio.shield(future)
+
+    def _check_generation(self):
+        """Table d'internement vidée depuis : les Frontier mémorisées désignent des noms qui n'y sont plus."""
+        if self._generation != node_table.generation:
+            self._memo.clear()
+            self._generation = node_table.generation
+
+    def _settled(self, key, future):
+        """
+        Développement terminé : un échec (exception marquée comme lue) ou une Frontier incomplète
+        est retiré de la mémoire, pour être retenté par la requête suivante.
+        """
+        if future.cancelled() or future.exception() is not None or future.result().unknown:
+            entry = self._memo.get(key)
+            if entry is not None and entry[0] is future:
+                del self._memo[key]
+
+    def _forget(self, direction, node, type_id):
+        """
+        Voisinage sortant (node, type_id) relu et changé : retire de la mémoire chaque préfixe qui l'a
+        lu, c'est-à-dire dont un saut de ce type part de `node`, et par là tous ses prolongements.
+        Un préfixe parent absent ou pas encore développé ne permet pas de trancher : on retire aussi.
+        """
+        if direction != "from":
+            return
+        self._check_generation()
+        node_id = node_table.intern(node)
+        stale = []
+        for key in self._memo:
+            node_a, prefix, plan_key = key
+            for depth, hop_type in enumerate(prefix):
+                if hop_type != type_id:
+                    continue
+                if depth == 0:
+                    hit = node_a == node
+                else:
+                    parent = self._memo.get((node_a, prefix[:depth], plan_key))
+                    hit = (parent is None or not parent[0].done() or parent[0].cancelled()
+                           or parent[0].exception() is not None or node_id in parent[0].result().end_nodes)
+                if hit:
+                    stale.append(key)
+                    break
+        for key in stale:
+            del self._memo[key]
+        if stale:
+            inc("memo_invalidations", len(stale))
+
+    async def _pinned_expand(self, node_a, prefix, plan=None):
+        # Le développement peut survivre à la requête qui l'a lancé : il épingle lui-même la table
+        with node_table.pinned():
+            return await self._expand(node_a, prefix, plan)
+
+    async def _expand(self, node_a, prefix, plan=None):
+        root = node_table.intern(node_a)
+        if not prefix:
+            return Frontier(np.zeros(1, dtype=np.int64), np.array([root], dtype=np.int32),
+                            np.zeros((1, 0), dtype=np.int32), np.full(1, np.nan), np.zeros((1, 0)))
+        parent = await self.frontier(node_a, prefix[:-1], plan)
+        type_id = prefix[-1]
+        nodes = list(dict.fromkeys(parent.end_nodes.tolist()))
+        # Seuil du plan au premier saut : appliqué avant l'internement, et envoyé à l'API si le voisinage n'est pas local
+        min_weight = plan.min_weight if plan is not None and len(prefix) == 1 else self.min_weight
+        fetch_weight = min_weight if plan is not None and plan.upstream and len(prefix) == 1 else self.min_weight
+        with timer("first_hop" if len(prefix) == 1 else "middle_hop"):
+            neighbourhoods = await asyncio.gather(*(
+                self.client.relations_from(node_table.name(node), type_id, fetch_weight) for node in nodes
+            ))
+        if len(prefix) == 1 and neighbourhoods[0] is None:
+            # Sans le premier saut, aucun chemin : un échec, et non une absence de résultats
+            raise SourceError(f"relations de {node_a} (type {type_id}) inconnues : requête échouée")
+        by_node = dict(zip(nodes, neighbourhoods))
+        unknown = sum(edges is None for edges in neighbourhoods)
+        if unknown:
+            inc("unknown_neighbourhoods", unknown)  # Requêtes échouées : chemins perdus, et non absents
+
+        end_ids, end_nodes, parents, weights = [], [], [], []
+        for index, (node, path) in enumerate(zip(parent.end_nodes.tolist(), parent.paths.tolist())):
+            visited = {root, *path}
+            for node_id, target, weight in by_node[node] or []:
+                if weight < min_weight:
+                    continue
+                target = node_table.intern(target)
+                # Pas de retour sur un nœud déjà parcouru au-delà du premier saut
+                if path and target in visited:
+                    continue
+                end_ids.append(node_id)
+                end_nodes.append(target)
+                parents.append(index)
+                weights.append(weight)
+
+        parents = np.asarray(parents, dtype=np.int64)
+        end_nodes = np.asarray(end_nodes, dtype=np.int32)
+        with timer("normalization"):
+            hop = normalize(weights)
+        norms = np.column_stack([parent.norms[parents], hop]) if len(parents) else np.zeros((0, len(prefix)))
+        first_weights = np.asarray(weights, dtype=np.float64) if len(prefix) == 1 else parent.first_weights[parents]
+        frontier = Frontier(np.asarray(end_ids, dtype=np.int64), end_nodes,
+                            np.column_stack([parent.paths[parents], end_nodes]), first_weights, norms,
+                            parent.unknown + unknown)
+
+        # Faisceau (et limite du plan) : on ne garde que les meilleurs chemins partiels avant le saut suivant
+        width = min(filter(None, (self.beam_width, plan.max_fanout if plan is not None else None)), default=None)
+        if width and len(frontier) > width:
+            keep = np.sort(np.argpartition(-path_scores(norms) if len(prefix) > 1 else -hop, width - 1)[:width])
+            frontier = frontier.take(keep)
+        return frontier
+
+    async def _resolve(self, schema, relation, report=True):
+        relations_dict = await self.client.relation_types()
+        names = schema.resolve(relation)
+        ids = []
+        for name in names:
+            relation_obj = relations_dict.get(name)
+            if not relation_obj or relation_obj.get("id") is None:
+                if report:
+                    print(f"Erreur: Relation '{name}' non trouvée (schéma {schema.name}).")
+                return None, None
+            ids.append(relation_obj["id"])
+        return names, tuple(ids)
+
+    async def _prepare(self, node_a, relation, schema, plan=None):
+        """
+        Relations du schéma (noms, identifiants) et Frontier de son préfixe, ou None si le schéma
+        est invalide. Lève SourceError si le premier saut n'a pas pu être lu.
+        """
+        if len(schema.relations) > self.max_depth:
+            print(f"Erreur: Schéma {schema.name} trop long (profondeur maximale {self.max_depth}).")
+            return None
+        names, ids = await self._resolve(schema, relation)
+        if ids is None:
+            return None
+        return names, ids, await self.frontier(node_a, ids[:-1], plan)
+
+    def _candidates(self, node_a, relation, node_b, names, frontier, finals, unknown=0):
+        """
+        CandidateSet des chemins dont le poids du dernier saut est connu (NaN sinon dans `finals`),
+        incomplet si un voisinage du préfixe ou `unknown` poids du dernier saut n'ont pas pu être lus.
+        """
+        found = np.flatnonzero(~np.isnan(finals))
+        with timer("normalization"):
+            norms = np.column_stack([frontier.norms[found], normalize(finals[found])])
+        with timer("scoring"):
+            return CandidateSet(
+                node_a, relation, node_b, [names], np.zeros(len(found), dtype=np.uint8),
+                frontier.end_ids[found], frontier.paths[found], frontier.first_weights[found], finals[found],
+                path_scores(norms) if len(found) else np.zeros(0),
+                incomplete=bool(frontier.unknown or unknown)
+            )
+
+    async def _evaluate_schema(self, node_a, relation, node_b, schema, top_k, plan=None):
+        prepared = await self._prepare(node_a, relation, schema, plan)
+        if prepared is None:
+            return None
+        names, ids, frontier = prepared
+
+        with timer("last_hop"):
+            finals, unknown = await last_hop_weights(self.client, frontier.ends(), node_b, ids[-1])
+        finals = np.fromiter((np.nan if w is None else w for w in finals), dtype=np.float64, count=len(frontier))
+        candidates = self._candidates(node_a, relation, node_b, names, frontier, finals, unknown)
+        inc("candidates", len(candidates), schema=schema.name)
+        if top_k is None:
+            return candidates
+        with timer("sort"):
+            return candidates.take(candidates.top(top_k))
+
+    async def _stream_schema(self, node_a, relation, node_b, schema, plan=None):
+        """
+        Générateur asynchrone des candidats provisoires d'un schéma : après chaque lot de poids
+        du dernier saut, les chemins connus sont renormalisés et rescorés. Le dernier
+        CandidateSet produit est identique à celui de _evaluate_schema (sans top-k).
+        """
+        prepared = await self._prepare(node_a, relation, schema, plan)
+        if prepared is None:
+            return
+        names, ids, frontier = prepared
+        finals, unknown = np.full(len(frontier), np.nan), 0
+        async for indices, weights, failed in stream_last_hop_weights(self.client, frontier.ends(), node_b, ids[-1]):
+            finals[indices] = [np.nan if w is None else w for w in weights]
+            unknown += failed
+            yield self._candidates(node_a, relation, node_b, names, frontier, finals, unknown)
+        inc("candidates", int(np.count_nonzero(~np.isnan(finals))), schema=schema.name)
+
+    async def materialize(self, node_a, relation, schemas):
+        """
+        Candidats de (node_a, relation) vers toutes les cibles atteignables : dictionnaire
+        node_b -> CandidateSet, identique à evaluate() pour chaque node_b. Le dernier saut est
+        lu dans le sens direct (relations sortantes de chaque intermédiaire, sans poids minimal)
+        au lieu des relations entrantes de node_b ; les scores sont calculés de la même façon.
+        """
+        by_target = {}
+        for schema in schemas:
+            prepared = await self._prepare(node_a, relation, schema)
+            if prepared is None:
+                continue
+            names, ids, frontier = prepared
+            ends = frontier.ends()
+            nodes = list(dict.fromkeys(name for _, name in ends))
+            with timer("last_hop"):
+                outgoing = await asyncio.gather(*(self.client.relations_from(name, ids[-1]) for name in nodes))
+            weights_by_node = {}
+            for name, edges in zip(nodes, outgoing):
+                weights = weights_by_node[name] = {}
+                for _, target, weight in edges or []:
+                    weights.setdefault(target, weight)
+            reached = {}
+            for index, (_, name) in enumerate(ends):
+                for target, weight in weights_by_node[name].items():
+                    reached.setdefault(target, []).append((index, weight))
+            for target, found in reached.items():
+                finals = np.full(len(frontier), np.nan)
+                indices, weights = zip(*found)
+                finals[list(indices)] = weights
+                by_target.setdefault(target, []).append(
+                    self._candidates(node_a, relation, target, names, frontier, finals))
+        return {target: CandidateSet.concat(sets, node_a, relation, target) for target, sets in by_target.items()}
+
+    async def prefetch(self, node_a, relation, schemas):
+        """Développe à l'avance les préfixes des `schemas` depuis node_a (les échecs sont ignorés)."""
+        async def warm(schema):
+            _, ids = await self._resolve(schema, relation, report=False)
+            if ids is not None and len(ids) <= self.max_depth:
+                await self.frontier(node_a, ids[:-1])
+        await asyncio.gather(*(warm(schema) for schema in schemas), return_exceptions=True)
+
+    async def plan(self, node_a, relation, node_b, schemas, budget):
+        """Plans d'exécution (nom du schéma -> Plan) pour un budget de latence de `budget` secondes."""
+        plans = {}
+        for schema in schemas:
+            _, ids = await self._resolve(schema, relation, report=False)
+            if ids is not None:
+                plans[schema.name] = self.planner.plan(node_a, ids[0], budget, node_b, ids[-1], len(ids))
+        return plans
+
+    async def evaluate(self, node_a, relation, node_b, schemas, top_k=None, plans=None):
+        """
+        Évalue tous les `schemas` pour (node_a, relation, node_b) et retourne un CandidateSet.
+        Avec `top_k`, chaque schéma (normalisé séparément) puis l'union sont tronqués aux k meilleurs.
+        `plans` (voir plan()) limite le premier saut de chaque schéma. Lève SourceError si le premier
+        saut d'un schéma n'a pas pu être lu ; les autres lectures échouées rendent le résultat incomplet.
+        """
+        plans = plans or {}
+        sets = await asyncio.gather(*(
+            self._evaluate_schema(node_a, relation, node_b, schema, top_k, plans.get(schema.name))
+            for schema in schemas
+        ))
+        results = CandidateSet.concat(sets, node_a, relation, node_b)
+        if top_k is None:
+            return results
+        with timer("sort"):
+            return results.take(results.top(top_k))
+
+    async def stream(self, node_a, relation, node_b, schemas, top_k=10, plans=None):
+        """
+        Générateur asynchrone de résultats progressifs : (CandidateSet des `top_k` meilleurs
+        candidats connus, terminé). Un nouveau top-k est produit chaque fois qu'un schéma reçoit
+        des poids du dernier saut ; le dernier (terminé vaut True) est le résultat définitif,
+        identique au top-k de evaluate(). Interrompre l'itération annule les appels en cours.
+        """
+        queue = asyncio.Queue()
+        plans = plans or {}
+
+        async def feed(index, schema):
+            try:
+                async for candidates in self._stream_schema(node_a, relation, node_b, schema, plans.get(schema.name)):
+                    queue.put_nowait((index, candidates))
+                queue.put_nowait((index, None))  # Fin du schéma
+            except Exception as exc:
+                queue.put_nowait((index, exc))
+
+        latest = [None] * len(schemas)
+        remaining = len(schemas)
+        tasks = [asyncio.ensure_future(feed(index, schema)) for index, schema in enumerate(schemas)]
+        try:
+            changed = False
+            while remaining:
+                index, candidates = await queue.get()
+                if isinstance(candidates, Exception):
+                    raise candidates
+                if candidates is None:
+                    remaining -= 1
+                else:
+                    latest[index] = candidates
+                    changed = True
+                # Les mises à jour arrivées ensemble ne produisent qu'un seul top-k
+                if (changed and queue.empty()) or not remaining:
+                    results = CandidateSet.concat(latest, node_a, relation, node_b)
+                    with timer("sort"):
+                        results = results.take(results.top(top_k))
+                    changed = False
+                    yield results, not remaining
+        finally:
+            for task in tasks:
+                task.cancel()
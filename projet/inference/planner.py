@@ -0,0 +1,132 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.metrics import metrics
+
+CALL_LATENCY = 0.2        # Latence (s) supposée d'un appel à l'API tant qu'aucune n'a été mesurée
+SCAN_COST = 1e-6          # Coût (s) par arête lue au premier saut : décodage et test du poids
+EDGE_COST = 5e-6          # Coût (s) par intermédiaire gardé : internement, dernier saut, normalisation, score
+MIN_FANOUT = 100          # Intermédiaires toujours gardés, même au-delà du budget : en dessous, plus de réponse
+STATS_SIZE = 4096         # Distributions de poids gardées en mémoire
+
+
+class Plan:
+    """
+    Plan d'exécution d'un schéma : poids minimal et nombre maximal d'intermédiaires du premier
+    saut, avec le compromis retenu (degré connu, part du poids total conservée, latence estimée).
+    Avec `upstream`, le voisinage du premier saut n'est pas en cache : le poids minimal est
+    envoyé à l'API, qui ne transfère que les arêtes gardées.
+    """
+
+    __slots__ = ("min_weight", "max_fanout", "degree", "coverage", "estimated_seconds", "upstream")
+
+    def __init__(self, min_weight, max_fanout=None, degree=None, coverage=1.0, estimated_seconds=None,
+                 upstream=False):
+        self.min_weight = min_weight
+        self.max_fanout = max_fanout
+        self.degree = degree
+        self.coverage = coverage
+        self.estimated_seconds = estimated_seconds
+        self.upstream = upstream
+
+    @property
+    def exhaustive(self):
+        return self.max_fanout is None
+
+    @property
+    def key(self):
+        """Partie du plan qui change les chemins développés (clé de mémorisation des préfixes)."""
+        return self.min_weight, self.max_fanout
+
+    def to_dict(self):
+        return {"min_weight": self.min_weight, "max_fanout": self.max_fanout, "degree": self.degree,
+                "coverage": self.coverage, "estimated_seconds": self.estimated_seconds,
+                "exhaustive": self.exhaustive, "upstream": self.upstream}
+
+
+class QueryPlanner:
+    """
+    Planificateur de requêtes : choisit, pour (node_a, type du premier saut), le poids minimal
+    et la limite d'intermédiaires qui tiennent dans un budget de latence.
+
+    Les statistiques (degré et distribution des poids) viennent de la source sans appel réseau
+    (cache d'arêtes ou instantané) et sont gardées en mémoire, plus longtemps que le cache.
+    Le coût estimé compte ce qui est réellement payé :
+    - un appel (latence mesurée) par voisinage qui n'est pas local : premier saut, chaque saut
+      intermédiaire (une vague d'appels parallèles) et chargement groupé du dernier saut ;
+    - SCAN_COST par arête du premier saut lue en entier (voisinage local : le seuil ne s'applique
+      qu'après la lecture) ; un voisinage distant est demandé avec le seuil, seules les arêtes gardées
+      sont alors transférées ;
+    - EDGE_COST par intermédiaire gardé.
+    Un nœud dont tout le voisinage tient dans le budget est exploré exhaustivement ; pour un
+    hub, on garde les arêtes les plus fortes (au moins MIN_FANOUT) et le seuil de poids devient
+    celui de la dernière gardée. Un degré inconnu ne peut pas être planifié : exploration exhaustive.
+    """
+
+    def __init__(self, client, min_weight=1, stats_size=STATS_SIZE):
+        self.client = client
+        self.min_weight = min_weight
+        self.stats_size = stats_size
+        self._stats = OrderedDict()  # (nœud, type) -> poids triés par ordre décroissant
+        client.on_change(self._forget)
+
+    def call_latency(self):
+        """Latence moyenne observée des appels à l'API (valeur par défaut sans mesure)."""
+        total, count = 0.0, 0
+        for (name, _), histogram in list(metrics.histograms.items()):
+            if name == "api_request_seconds":
+                total += histogram.sum
+                count += histogram.count
+        return total / count if count else CALL_LATENCY
+
+    def _forget(self, direction, node, type_id):
+        """Voisinage relu et changé : sa distribution de poids mémorisée n'est plus la bonne."""
+        if direction == "from":
+            self._stats.pop((node, type_id), None)
+
+    def weights(self, node, type_id):
+        key = (node, type_id)
+        if key in self._stats:
+            self._stats.move_to_end(key)
+            return self._stats[key]
+        local = self.client.local_weights(node, type_id, self.min_weight)
+        if local is None:
+            return None
+        weights = np.sort(np.asarray(local, dtype=np.float64))[::-1]
+        self._stats[key] = weights
+        while len(self._stats) > self.stats_size:
+            self._stats.popitem(last=False)
+        return weights
+
+    def plan(self, node_a, type_id, budget, node_b=None, last_type=None, hops=2):
+        """
+        Plan d'exécution du premier saut (node_a, type_id) d'un schéma de `hops` sauts dont le dernier
+        (type `last_type`) aboutit à node_b, pour un budget de `budget` secondes.
+        """
+        weights = self.weights(node_a, type_id)
+        latency = self.call_latency() if self.client.remote else 0.0
+        local = self.client.is_local("from", node_a, type_id, self.min_weight)
+        last_local = node_b is None or self.client.is_local("to", node_b, last_type)
+        # Sauts intermédiaires (une vague d'appels parallèles chacun) et chargement groupé du dernier saut
+        fixed = (hops - 2) * latency + (0.0 if last_local else latency)
+        if weights is None:
+            return Plan(self.min_weight, None, estimated_seconds=fixed + latency)
+        degree = len(weights)
+        if local:
+            fixed += degree * SCAN_COST
+            per_edge = EDGE_COST
+        else:
+            fixed += latency
+            per_edge = EDGE_COST + SCAN_COST
+        max_fanout = max(MIN_FANOUT, math.floor((budget - fixed) / per_edge) if budget > fixed else 0)
+        if degree <= max_fanout:
+            return Plan(self.min_weight, None, degree, 1.0, fixed + degree * per_edge)
+        positive = weights[weights > 0]
+        total = positive.sum()
+        coverage = float(positive[:max_fanout].sum() / total) if total > 0 else max_fanout / degree
+        min_weight = weights[max_fanout - 1].item()
+        min_weight = int(min_weight) if min_weight == int(min_weight) else min_weight
+        return Plan(max(self.min_weight, min_weight), max_fanout, degree, coverage,
+                    fixed + max_fanout * per_edge, upstream=not local)
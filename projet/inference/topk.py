@@ -0,0 +1,46 @@
+import asyncio
+from utils import metrics
+
+
+async def last_hop_weights(client, ends, node_b, type_id):
+    """
+    Poids du dernier saut (dernier intermédiaire -> node_b) pour chaque chemin, None quand
+    la relation est absente, et nombre de poids inconnus (requêtes échouées, None eux aussi).
+    `ends` : [id, nom] du dernier intermédiaire de chaque chemin.
+
+    Chargement groupé des relations entrantes de node_b, ou appels par paire en repli
+    (DataSource.relation_weights), tous envoyés : le dernier saut étant normalisé (min-max)
+    sur l'ensemble des poids trouvés, un poids encore inconnu peut changer le score de tous
+    les chemins, et aucun arrêt anticipé ne garantirait le même top-k.
+    """
+    return await client.relation_weights(ends, node_b, type_id)
+
+
+async def stream_last_hop_weights(client, ends, node_b, type_id):
+    """
+    Variante progressive de last_hop_weights : générateur asynchrone de lots (indices, poids,
+    nombre de poids inconnus) livrés au fur et à mesure de leur arrivée. Le chargement groupé
+    livre tout en un lot ; en repli, chaque lot réunit les appels par paire terminés depuis le lot précédent.
+    """
+    weights_by_id = await client.incoming_weights(node_b, type_id)
+    if weights_by_id is not None:
+        yield list(range(len(ends))), [weights_by_id.get(node_id) for node_id, _ in ends], 0
+        return
+
+    async def pair(index):
+        try:
+            return index, await client.relation_weight(ends[index][1], node_b, type_id), False
+        except Exception:
+            metrics.inc("unknown_edges")  # Requête échouée : poids inconnu, et non relation absente
+            return index, None, True
+
+    pending = {asyncio.ensure_future(pair(index)) for index in range(len(ends))}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            results = [task.result() for task in done]
+            yield ([index for index, _, _ in results], [weight for _, weight, _ in results],
+                   sum(failed for _, _, failed in results))
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,107 +1,208 @@
 import os
 import json
-import requests
-import sys
-import time
-from inference.direct import direct_inference
-from inference.deductive import deductive_inference
-from inference.inductive import inductive_inference
+import argparse
+import asyncio
+import signal
+from inference.engine import InferenceEngine
+from inference.candidates import format_path
+from inference.materialized import MaterializedIndex, INDEX_FILE
+from inference.paths import PathSchema, MAX_DEPTH
+from utils.api import MAX_CONCURRENCY, RATE_LIMIT
+from utils.source import SourceError
+from utils.metrics import metrics, query_report, timer
 
 
-# Définir RELATIONS_FILE relatif au dossier contenant main.py
 script_dir = os.path.dirname(os.path.abspath(__file__))
-RELATIONS_FILE = os.path.join(script_dir, 'data', 'relations.json')
-def load_relations():
-    """Charge les types de relations depuis un fichier JSON indexé, ou via l'API si le fichier n'existe pas."""
-    directory = os.path.dirname(RELATIONS_FILE)
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-    
-    if not os.path.exists(RELATIONS_FILE):
-        response = requests.get("https://jdm-api.demo.lirmm.fr/v0/relations_types")
-        if response.status_code == 200:
-            data = response.json()
-            # Construire un dictionnaire indexé par id, name et gpname
-            relations_index = {}
-            for rel in data:
-                relations_index[str(rel["id"])] = rel
-                relations_index[rel["name"]] = rel
-                relations_index[rel["gpname"]] = rel
-            with open(RELATIONS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(relations_index, f, ensure_ascii=False, indent=2)
-            print("Relations enregistrées dans", RELATIONS_FILE)
-            return relations_index
-        else:
-            print("Erreur lors de la récupération des types de relations.")
-            return {}
-    else:
-        with open(RELATIONS_FILE, 'r', encoding='utf-8') as f:
-            relations_index = json.load(f)
-        return relations_index
+SNAPSHOT_DIR = os.path.join(script_dir, 'data', 'snapshot')
 
 
-# Charger les relations au démarrage
-relations_data = load_relations()
+def print_results(results, order):
+    for i, res in enumerate(results.records(order), 1):
+        print(f"{i} | {format_path(res)} | {res.score:.2f}")
+
+
+def print_plans(plans):
+    """Compromis retenu par le planificateur pour chaque schéma."""
+    for name, plan in plans.items():
+        degree = plan["degree"] if plan["degree"] is not None else "?"
+        if plan["exhaustive"]:
+            print(f"plan {name}: exhaustif (degré {degree})")
+        else:
+            source = " (seuil envoyé à l'API)" if plan["upstream"] else ""
+            print(f"plan {name}: poids >= {plan['min_weight']}{source}, {plan['max_fanout']} intermédiaires sur "
+                  f"{degree} ({plan['coverage']:.0%} du poids), ~{plan['estimated_seconds']:.2f} s")
 
-# Construire un dictionnaire pour la recherche rapide par id, name ou gpname
-relations_dict = {rel["id"]: rel for rel in relations_data}
-relations_dict.update({rel["name"]: rel for rel in relations_data})
-relations_dict.update({rel["gpname"]: rel for rel in relations_data})
 
-def run_inference(node_a, relation, node_b):
-    # Vérifier si la relation est valide en utilisant le JSON local
-    if relation not in relations_dict:
+async def run_inference_async(engine, node_a, relation, node_b, top_k=None, show_metrics=False, full=False,
+                              budget=None):
+    # Vérifier si la relation est valide (index local des types, sans appel réseau)
+    if relation not in await engine.client.relation_types():
         print(f"Erreur: Relation '{relation}' non trouvée.")
         return
 
-    direct_results = direct_inference(node_a, relation, node_b)
+    # L'étape directe et les schémas de chemins tournent en parallèle sur le même client
+    outcome = await engine.run(node_a, relation, node_b, top_k, budget)
+    print(outcome["direct"])
+    if "plans" in outcome:
+        print_plans(outcome["plans"])
     
     # Si un résultat direct est trouvé et son poids est négatif, on arrête l'inférence
-    if direct_results and direct_results[0][1] < 0:
+    if outcome["results"] is None:
         print("No.")
+        if show_metrics:
+            print(json.dumps(outcome["metrics"].to_dict(), ensure_ascii=False, indent=2))
         return
-    start_time = time.time()
-    deductive_results = deductive_inference(node_a, relation, node_b)
-    deductive_time = time.time() - start_time
+    if "index" in outcome["times"]:
+        print(f"index time: {outcome['times']['index']:.4f} seconds (précalculé)")
+    else:
+        print(f"inference time: {outcome['times']['paths']:.2f} seconds ({len(engine.schemas)} schemas)")
+
+    results = outcome["results"]
+    if results.incomplete:
+        print("Attention : des requêtes ont échoué, résultats incomplets.")
+
+    if not len(results):
+        print("Aucun résultat déductif disponible.")
+    else:
+        # Trier les résultats par score décroissant (les dictionnaires ne servent qu'à l'affichage)
+        with query_report(outcome["metrics"]), timer("sort"):
+            order = results.top(None if full else 10)
+        # La liste complète peut compter des milliers de chemins : affichage sur demande seulement
+        if full:
+            print("=== Affichage complet ===")
+            print_results(results, order)
+            print()
 
-    start_time = time.time()
-    inductive_results = inductive_inference(node_a, relation, node_b)
-    inductive_time = time.time() - start_time
+        print("=== Top 10 ===")
+        print_results(results, order[:10])
 
-    print(f"deductive time: {deductive_time:.2f} seconds, inductive time: {inductive_time:.2f} seconds")
+    if show_metrics:
+        print(json.dumps(outcome["metrics"].to_dict(), ensure_ascii=False, indent=2))
 
-    results = deductive_results + inductive_results
 
-    if not results:
-        print("Aucun résultat déductif disponible.")
+async def stream_inference_async(engine, node_a, relation, node_b, top_k=None, budget=None):
+    """
+    Mode progressif : affiche le meilleur chemin provisoire à chaque mise à jour, puis le top-k
+    définitif. Si la requête est annulée (Ctrl-C), le dernier top-k provisoire est affiché.
+    """
+    if relation not in await engine.client.relation_types():
+        print(f"Erreur: Relation '{relation}' non trouvée.")
+        return
+    top_k = top_k or 10
+    update = None
+    try:
+        async for update in engine.stream(node_a, relation, node_b, top_k, budget):
+            results = update["results"]
+            if update["final"] or results is None or not len(results):
+                continue
+            best = results.records([0])[0]
+            print(f"[{update['elapsed']:.2f} s] {format_path(best)} | {best.score:.2f}")
+    except asyncio.CancelledError:
+        print("Interrompu.")
+        if update is None or update["results"] is None:
+            return
+    print(update["direct"])
+    if "plans" in update:
+        print_plans(update["plans"])
+    if update["results"] is None:
+        print("No.")
         return
+    if update["results"].incomplete:
+        print("Attention : des requêtes ont échoué, résultats incomplets.")
+    if not len(update["results"]):
+        print("Aucun résultat déductif disponible.")
+    else:
+        print(f"=== Top {top_k} ({'définitif' if update['final'] else 'provisoire'}, {update['elapsed']:.2f} s) ===")
+        print_results(update["results"], None)
 
-        # Trier les résultats par score décroissant
-    results.sort(key=lambda x: x['score'], reverse=True)
-    print("=== Affichage complet ===")
-    for i, res in enumerate(results, 1):
-        formatted = f"{res['node_a']} {res['first_relation']} {res['intermediate_node']} & {res['intermediate_node']} {res['second_relation']} {res['node_b']}"
-        print(f"{i} | {formatted} | {res['score']:.2f}")
 
-    print("\n=== Top 10 ===")
-    for i, res in enumerate(results[:10], 1):
-        formatted = f"{res['node_a']} {res['first_relation']} {res['intermediate_node']} & {res['intermediate_node']} {res['second_relation']} {res['node_b']}"
-        print(f"{i} | {formatted} | {res['score']:.2f}")
+def run_inference(node_a, relation, node_b, max_concurrency=MAX_CONCURRENCY, rate_limit=RATE_LIMIT, snapshot=None,
+                  top_k=None, schemas=(), show_metrics=False, full=False, stream=False, budget=None, index=None):
+    async def runner():
+        materialized = MaterializedIndex(index) if index else None
+        async with InferenceEngine(max_concurrency, rate_limit, snapshot=snapshot, schemas=schemas,
+                                   index=materialized) as engine:
+            if stream:
+                await stream_inference_async(engine, node_a, relation, node_b, top_k, budget)
+            else:
+                await run_inference_async(engine, node_a, relation, node_b, top_k, show_metrics, full, budget)
+    asyncio.run(runner())
 
-if __name__ == "__main__":
+
+async def interactive(max_concurrency, rate_limit, snapshot=None, top_k=None, schemas=(), max_depth=MAX_DEPTH,
+                      beam_width=None, show_metrics=False, full=False, stream=False, budget=None, index=None):
+    """Boucle interactive : un seul moteur (et donc un seul pool de connexions) pour toute la session."""
     print("Enter queries in the format: nodeA relation nodeB")
-    print("Type 'exit' to quit.")
-    
-    while True:
-        user_input = input("→ ").strip()
-        
-        if user_input.lower() == 'exit':
-            break
-        
-        parts = user_input.split()
-        if len(parts) != 3:
-            print("Invalid format. Use: nodeA relation nodeB")
-            continue
-        
-        nodeA, relation, nodeB = parts
-        run_inference(nodeA, relation, nodeB)
+    print("Type 'metrics' for the session metrics, 'exit' to quit.")
+    loop = asyncio.get_running_loop()
+    engine = InferenceEngine(max_concurrency, rate_limit, snapshot=snapshot, schemas=schemas,
+                             max_depth=max_depth, beam_width=beam_width,
+                             index=MaterializedIndex(index) if index else None)
+    async with engine:
+        while True:
+            user_input = (await loop.run_in_executor(None, input, "→ ")).strip()
+            
+            if user_input.lower() == 'exit':
+                break
+
+            if user_input.lower() == 'metrics':
+                # Agrégat de la session, au format texte de Prometheus
+                print(metrics.render_prometheus(), end="")
+                continue
+            
+            parts = user_input.split()
+            if len(parts) != 3:
+                print("Invalid format. Use: nodeA relation nodeB")
+                continue
+            
+            nodeA, relation, nodeB = parts
+            if stream:
+                query = asyncio.ensure_future(stream_inference_async(engine, nodeA, relation, nodeB, top_k, budget))
+            else:
+                query = asyncio.ensure_future(run_inference_async(engine, nodeA, relation, nodeB, top_k,
+                                                                  show_metrics, full, budget))
+            # Ctrl-C annule la requête en cours plutôt que la session
+            try:
+                loop.add_signal_handler(signal.SIGINT, query.cancel)
+            except (NotImplementedError, RuntimeError):
+                pass
+            try:
+                await query
+            except asyncio.CancelledError:
+                print("Interrompu.")
+            except SourceError as exc:
+                print(f"Erreur: {exc}")
+            finally:
+                try:
+                    loop.remove_signal_handler(signal.SIGINT)
+                except (NotImplementedError, RuntimeError):
+                    pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inférence sur le graphe JeuxDeMots.")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="nombre maximal de requêtes HTTP simultanées")
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT,
+                        help="requêtes par seconde et par hôte (0 pour désactiver)")
+    parser.add_argument("--snapshot", nargs="?", const=SNAPSHOT_DIR,
+                        help="travailler hors ligne sur un instantané local du graphe")
+    parser.add_argument("--top-k", type=int,
+                        help="ne garder que les k meilleurs résultats (par schéma, puis sur l'union)")
+    parser.add_argument("--schema", action="append", default=[], type=PathSchema.parse,
+                        help="schéma de chemin supplémentaire, par ex. 'r_isa>r_isa>R' (répétable)")
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH, help="nombre maximal de sauts d'un schéma")
+    parser.add_argument("--beam", type=int, help="chemins partiels conservés à chaque saut intermédiaire")
+    parser.add_argument("--metrics", action="store_true",
+                        help="afficher le rapport de mesures (JSON) de chaque requête")
+    parser.add_argument("--full", action="store_true", help="afficher la liste complète des résultats")
+    parser.add_argument("--stream", action="store_true",
+                        help="afficher les résultats provisoires au fil de l'eau (Ctrl-C pour s'arrêter)")
+    parser.add_argument("--budget", type=float,
+                        help="budget de latence par requête (s) : le planificateur limite les hubs")
+    parser.add_argument("--index", nargs="?", const=INDEX_FILE,
+                        help="servir les requêtes précalculées depuis l'index matérialisé (voir materialize.py)")
+    args = parser.parse_args()
+    asyncio.run(interactive(args.concurrency, args.rate_limit, args.snapshot, args.top_k, args.schema,
+                            args.max_depth, args.beam, args.metrics, args.full, args.stream, args.budget,
+                            args.index))
@@ -0,0 +1,201 @@
+import sys
+import time
+import asyncio
+import argparse
+from collections import Counter
+from inference.engine import InferenceEngine
+from inference.paths import PathInference, PathSchema, MAX_DEPTH
+from inference.materialized import (MaterializedIndex, DependencyRecorder, INDEX_FILE, edges_digest,
+                                    encode_entry)
+from batch import SNAPSHOT_DIR
+from utils.api import ApiClient, MAX_CONCURRENCY, RATE_LIMIT
+from utils.cache import EdgeCache, CACHE_FILE, NEGATIVE_TTL
+from utils.intern import node_table
+from utils.source import SourceError
+
+HOT_PAIRS = 1000   # Couples (node_a, relation) matérialisés par défaut
+MAX_AGE = 3600     # Âge maximal (s) d'un voisinage en cache lors d'un rafraîchissement
+
+
+def read_queries(stream):
+    """
+    Compte les couples (node_a, relation) d'un journal de requêtes, une requête
+    « nodeA relation [nodeB] » par ligne (même découpage que batch.read_triples).
+    """
+    counts = Counter()
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [part.strip() for part in line.split("\t")] if "\t" in line else line.split()
+        if len(parts) not in (2, 3):
+            print(f"Ligne ignorée (format invalide) : {line}", file=sys.stderr)
+            continue
+        counts[(parts[0], parts[1])] += 1
+    return counts
+
+
+async def materialize_pair(engine, node_a, relation):
+    """
+    Calcule toutes les réponses de (node_a, relation) avec la configuration du moteur :
+    (node_b -> réponse sérialisée, dépendances), ou None si une lecture a échoué (SourceError
+    si c'est celle du premier saut).
+    """
+    relation_info = (await engine.client.relation_types()).get(relation)
+    if not relation_info or relation_info.get("id") is None:
+        print(f"Erreur: Relation '{relation}' non trouvée.", file=sys.stderr)
+        return None
+    # Moteur de chemins à part : sa mémoire des préfixes vide garantit que chaque lecture est enregistrée
+    source = DependencyRecorder(engine.client)
+    paths = PathInference(source, max_depth=engine.paths.max_depth, beam_width=engine.paths.beam_width)
+    with node_table.pinned():  # Identifiants internés valides jusqu'à la sérialisation des réponses
+        results = await paths.materialize(node_a, relation, engine.schemas)
+        direct_edges = await source.relations_from(node_a, relation_info["id"])
+        if None in source.reads.values():
+            return None
+        direct = {}
+        for _, target, weight in direct_edges:
+            direct.setdefault(target, []).append(weight)
+        entries = {target: encode_entry(direct.get(target, []), results.get(target))
+                   for target in direct.keys() | results.keys()}
+    return entries, source.reads
+
+
+async def changed_pairs(engine, index, pairs):
+    """
+    Relit une seule fois chaque voisinage dont dépend au moins un couple de `pairs` et compare son
+    empreinte à celle enregistrée : retourne (couples touchés par un changement, couples dont une
+    lecture a échoué, voisinages relus, voisinages changés).
+    """
+    watched = {key: [(node_a, relation, digest) for node_a, relation, digest in dependents
+                     if (node_a, relation) in pairs]
+               for key, dependents in index.watched().items()}
+    watched = {key: dependents for key, dependents in watched.items() if dependents}
+
+    async def read(node, type_id, min_weight):
+        try:
+            return await engine.client.relations_from(node, type_id, min_weight)
+        except SourceError:
+            return None
+
+    neighbourhoods = await asyncio.gather(*(read(*key) for key in watched))
+    changed, failed, modified = set(), set(), 0
+    for dependents, edges in zip(watched.values(), neighbourhoods):
+        digest = edges_digest(edges)
+        if edges is not None and all(stored == digest for *_, stored in dependents):
+            continue
+        modified += edges is not None
+        for node_a, relation, stored in dependents:
+            if edges is None:
+                failed.add((node_a, relation))
+            elif stored != digest:
+                changed.add((node_a, relation))
+    return changed, failed - changed, len(watched), modified
+
+
+async def run_job(engine, index, build, refresh, jobs=8):
+    """
+    Matérialise les couples `build` et rafraîchit les couples `refresh` (node_a, relation -> configuration
+    enregistrée) : chaque voisinage dont ils dépendent est relu une fois (requête conditionnelle sur l'API)
+    et seuls les couples dont la configuration ou l'une des dépendances a changé sont recalculés.
+    Un couple touché est recalculé en entier (tous ses node_b, normalisations comprises) : seules
+    les écritures se limitent aux entrées dont la réponse a changé. Le coût de calcul suit donc le
+    nombre de couples touchés, et non celui des arêtes changées.
+    Retourne les statistiques du traitement.
+    """
+    stats = Counter()
+    semaphore = asyncio.Semaphore(jobs)
+    reconfigured = {pair for pair, config in refresh.items() if config != engine.config}
+    changed, failed, stats["checked"], stats["changed"] = await changed_pairs(
+        engine, index, refresh.keys() - reconfigured)
+    stats["failed"] += len(failed)
+    for pair in refresh.keys() - reconfigured - changed - failed:
+        index.touch(*pair)
+        stats["unchanged"] += 1
+
+    async def process(node_a, relation, refreshed=False):
+        async with semaphore:
+            try:
+                materialized = await materialize_pair(engine, node_a, relation)
+            except SourceError as exc:
+                print(f"Erreur: {node_a} {relation} : {exc}", file=sys.stderr)
+                materialized = None
+            if materialized is None:
+                stats["failed"] += 1
+                return
+            entries, reads = materialized
+            written, deleted = index.store(node_a, relation, engine.config, entries, reads)
+            stats["updated" if refreshed else "built"] += 1
+            stats["entries"] += len(entries)
+            stats["written"] += written
+            stats["deleted"] += deleted
+
+    await asyncio.gather(*(process(node_a, relation) for node_a, relation in build),
+                         *(process(node_a, relation, True) for node_a, relation in reconfigured | changed))
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Précalcule les inférences des couples (node_a, relation) les plus demandés.")
+    parser.add_argument("input", nargs="?",
+                        help="journal de requêtes « nodeA relation [nodeB] » ('-' pour l'entrée standard)")
+    parser.add_argument("--hot", type=int, default=HOT_PAIRS, help="nombre de couples les plus fréquents à matérialiser")
+    parser.add_argument("--refresh", action="store_true",
+                        help="revérifier les couples déjà matérialisés et ne recalculer que ceux qui ont changé")
+    parser.add_argument("--max-age", type=float, default=MAX_AGE,
+                        help="âge (s) au-delà duquel un voisinage en cache est revalidé sur l'API lors du rafraîchissement")
+    parser.add_argument("--index", default=INDEX_FILE, help="fichier de l'index matérialisé")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="couples traités simultanément")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="nombre maximal de requêtes HTTP simultanées")
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT,
+                        help="requêtes par seconde et par hôte (0 pour désactiver)")
+    parser.add_argument("--snapshot", nargs="?", const=SNAPSHOT_DIR,
+                        help="travailler hors ligne sur un instantané local du graphe")
+    parser.add_argument("--schema", action="append", default=[], type=PathSchema.parse,
+                        help="schéma de chemin supplémentaire, par ex. 'r_isa>r_isa>R' (répétable)")
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH, help="nombre maximal de sauts d'un schéma")
+    parser.add_argument("--beam", type=int, help="chemins partiels conservés à chaque saut intermédiaire")
+    args = parser.parse_args(argv)
+    if not args.input and not args.refresh:
+        parser.error("indiquer un journal de requêtes et/ou --refresh")
+
+    index = MaterializedIndex(args.index)
+    indexed = {(node_a, relation): config for node_a, relation, config, _, _ in index.pairs()}
+    hot = []
+    if args.input:
+        if args.input == "-":
+            counts = read_queries(sys.stdin)
+        else:
+            with open(args.input, 'r', encoding='utf-8') as f:
+                counts = read_queries(f)
+        hot = [pair for pair, _ in counts.most_common(args.hot)]
+    refresh = indexed if args.refresh else {}
+    build = [pair for pair in hot if pair not in refresh]
+
+    # Rafraîchissement : les voisinages en cache depuis plus de --max-age secondes sont revalidés sur l'API
+    # (requête conditionnelle : un 304 évite le transfert) ; sur un instantané, ils sont relus localement.
+    # Les absences (et les filtres de Bloom) ne doivent pas vivre plus longtemps que le reste
+    client = None
+    if args.refresh and not args.snapshot:
+        cache = EdgeCache(CACHE_FILE, ttl=args.max_age, negative_ttl=min(NEGATIVE_TTL, args.max_age))
+        client = ApiClient(cache=cache, max_concurrency=args.concurrency, rate_limit=args.rate_limit)
+
+    async def runner():
+        async with InferenceEngine(args.concurrency, args.rate_limit, client=client, snapshot=args.snapshot,
+                                   schemas=args.schema, max_depth=args.max_depth, beam_width=args.beam) as engine:
+            return await run_job(engine, index, build, refresh, args.jobs), engine.client.calls
+
+    start_time = time.time()
+    stats, calls = asyncio.run(runner())
+    index.close()
+    print(f"{stats['built']} couples matérialisés, {stats['updated']} recalculés, {stats['unchanged']} inchangés, "
+          f"{stats['failed']} en échec | {stats['changed']}/{stats['checked']} voisinages changés | "
+          f"{stats['entries']} entrées ({stats['written']} écrites, "
+          f"{stats['deleted']} supprimées) | {calls} appels API | {time.time() - start_time:.2f} s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
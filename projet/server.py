@@ -0,0 +1,153 @@
+import json
+import asyncio
+import argparse
+from functools import partial
+from aiohttp import web
+from inference.engine import InferenceEngine
+from inference.paths import PathSchema
+from inference.materialized import MaterializedIndex, INDEX_FILE
+from batch import make_record, SNAPSHOT_DIR
+from utils.api import MAX_CONCURRENCY, RATE_LIMIT, TransientError
+from utils.source import SourceError
+from utils.metrics import metrics
+
+json_dumps = partial(json.dumps, ensure_ascii=False)
+
+
+class InferenceServer:
+    """
+    Serveur d'inférence HTTP (JSON) longue durée : un seul InferenceEngine reste ouvert,
+    avec son pool de connexions, l'index des types de relations, les préfixes de chemins
+    mémorisés et le cache d'arêtes, tous chauds d'une requête à l'autre.
+
+    Les requêtes identiques en cours sont fusionnées : un seul calcul par triplet (et,
+    dans le client, un seul appel amont par voisinage ou couple (intermédiaire, node_b, type)).
+    """
+
+    def __init__(self, engine, top=10, prune=False):
+        self.engine = engine
+        self.top = top
+        self.prune = prune
+        self._inflight = {}
+
+    async def infer(self, node_a, relation, node_b, top, budget=None):
+        key = (node_a, relation, node_b, top, budget)
+        if key in self._inflight:
+            metrics.inc("coalesced_queries")
+            return await asyncio.shield(self._inflight[key])
+        future = asyncio.ensure_future(self._infer(node_a, relation, node_b, top, budget))
+        self._inflight[key] = future
+        future.add_done_callback(lambda done: self._settled(key, done))
+        return await asyncio.shield(future)
+
+    def _settled(self, key, future):
+        self._inflight.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # Échec déjà remonté aux requêtes en attente : marqué comme consulté
+
+    async def _infer(self, node_a, relation, node_b, top, budget):
+        relations_dict = await self.engine.client.relation_types()
+        if relation not in relations_dict:
+            return make_record(None, node_a, relation, node_b, error="relation inconnue")
+        outcome = await self.engine.run(node_a, relation, node_b, top if self.prune else None, budget)
+        return make_record(None, node_a, relation, node_b, outcome, top, with_metrics=True)
+
+    async def handle_infer(self, request):
+        """
+        GET /infer?node_a=..&relation=..&node_b=..[&top=..][&budget=..][&metrics=1] ou POST /infer avec
+        le même objet JSON ; avec « metrics », la réponse porte le rapport de mesures de la requête,
+        avec « budget » (secondes), les plans d'exécution retenus (clé "plans"). Un échec de la source
+        amont donne un enregistrement JSON portant « error », avec le statut 503 (transitoire) ou 502.
+        """
+        params = dict(request.query)
+        if request.method == "POST":
+            try:
+                body = await request.json()
+            except ValueError:
+                body = None
+            if not isinstance(body, dict):
+                return web.json_response({"error": "JSON invalide"}, status=400)
+            params.update(body)
+        missing = [name for name in ("node_a", "relation", "node_b") if not params.get(name)]
+        if missing:
+            return web.json_response({"error": f"paramètres manquants : {', '.join(missing)}"}, status=400)
+        try:
+            top = int(params.get("top", self.top))
+        except (TypeError, ValueError):
+            return web.json_response({"error": "top doit être un entier"}, status=400)
+        try:
+            budget = float(params["budget"]) if params.get("budget") else None
+        except (TypeError, ValueError):
+            return web.json_response({"error": "budget doit être un nombre"}, status=400)
+        try:
+            record = await self.infer(params["node_a"], params["relation"], params["node_b"], top, budget)
+        except SourceError as exc:
+            # Source amont injoignable ou en échec : erreur JSON comme dans batch.py, 503 si elle est transitoire
+            record = make_record(None, params["node_a"], params["relation"], params["node_b"],
+                                 error=str(exc) or type(exc).__name__)
+            status = 503 if isinstance(exc, TransientError) else 502
+            return web.json_response({key: value for key, value in record.items() if key != "index"},
+                                     status=status, dumps=json_dumps)
+        # L'enregistrement peut être partagé entre requêtes fusionnées : on n'en modifie qu'une copie
+        hidden = {"index"} if params.get("metrics") else {"index", "metrics"}
+        record = {key: value for key, value in record.items() if key not in hidden}
+        return web.json_response(record, dumps=json_dumps)
+
+    async def handle_health(self, request):
+        return web.json_response({"status": "ok", "in_flight": len(self._inflight), "api_calls": self.engine.client.calls})
+
+    async def handle_metrics(self, request):
+        """Mesures agrégées du processus : texte Prometheus sur /metrics, JSON sur /metrics.json."""
+        if request.path.endswith(".json"):
+            return web.json_response(metrics.to_dict(), dumps=json_dumps)
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def _startup(self, app):
+        await self.engine.client.open()
+        await self.engine.client.relation_types()  # Index des types chargé avant la première requête
+
+    async def _cleanup(self, app):
+        await self.engine.client.close()
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/infer", self.handle_infer)
+        app.router.add_post("/infer", self.handle_infer)
+        app.router.add_get("/health", self.handle_health)
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.router.add_get("/metrics.json", self.handle_metrics)
+        app.on_startup.append(self._startup)
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur d'inférence JeuxDeMots (HTTP / JSON).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix", help="écouter sur un socket Unix plutôt qu'en TCP")
+    parser.add_argument("--top", type=int, default=10, help="nombre de chemins retournés par défaut")
+    parser.add_argument("--prune", action="store_true", help="mode top-k (voir batch.py --prune)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="nombre maximal de requêtes HTTP simultanées vers l'API")
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT,
+                        help="requêtes par seconde et par hôte (0 pour désactiver)")
+    parser.add_argument("--snapshot", nargs="?", const=SNAPSHOT_DIR,
+                        help="travailler hors ligne sur un instantané local du graphe")
+    parser.add_argument("--schema", action="append", default=[], type=PathSchema.parse,
+                        help="schéma de chemin supplémentaire, par ex. 'r_isa>r_isa>R' (répétable)")
+    parser.add_argument("--index", nargs="?", const=INDEX_FILE,
+                        help="servir les requêtes précalculées depuis l'index matérialisé (voir materialize.py)")
+    args = parser.parse_args(argv)
+
+    engine = InferenceEngine(args.concurrency, args.rate_limit, snapshot=args.snapshot, schemas=args.schema,
+                             index=MaterializedIndex(args.index) if args.index else None)
+    server = InferenceServer(engine, args.top, args.prune)
+    if args.unix:
+        web.run_app(server.app(), path=args.unix)
+    else:
+        web.run_app(server.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
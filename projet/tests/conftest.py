@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# Les modules du projet s'importent depuis projet/ (from utils.xxx import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import read_triples  # noqa: E402
+from bench.run import CORPUS_FILE  # noqa: E402
+from bench.synthetic import SyntheticGraph  # noqa: E402
+from utils.relations import load_relation_types  # noqa: E402
+from utils.snapshot import SnapshotBuilder  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    """Triplets (indice, node_a, relation, node_b) du corpus du banc d'essai."""
+    with open(CORPUS_FILE, 'r', encoding='utf-8') as f:
+        return read_triples(f)
+
+
+@pytest.fixture(scope="session")
+def snapshot_dir(corpus, tmp_path_factory):
+    """Instantané du graphe synthétique du banc d'essai (mêmes données que les fixtures de l'API)."""
+    graph = SyntheticGraph(corpus)
+    builder = SnapshotBuilder()
+    for (source, target, type_id), weight in graph.edges.items():
+        builder.add(type_id, source, target, weight, src_id=graph.ids[source], dst_id=graph.ids[target])
+    path = str(tmp_path_factory.mktemp("snapshot"))
+    builder.write(path, load_relation_types())
+    return path
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from utils import api
+from utils.api import ApiClient, CircuitBreaker, TransientError, BREAKER_THRESHOLD, HEDGE_MIN_SAMPLES
+from utils.cache import EdgeCache
+from utils.metrics import Histogram, metrics
+
+BODY = {"nodes": [{"id": 1, "name": "kiwi"}, {"id": 2, "name": "voler"}],
+        "relations": [{"id": 1, "node1": 1, "node2": 2, "type": 24, "w": 40}]}
+
+
+class SlowClient(ApiClient):
+    """ApiClient dont chaque réponse arrive après `delay` secondes, sans réseau."""
+
+    def __init__(self, cache, delay=0.05):
+        super().__init__(cache=cache, rate_limit=0)
+        self.delay = delay
+
+    async def get_response(self, url, endpoint="other", raw=False, etag=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        payload = json.dumps(BODY).encode()
+        return 200, (payload, None) if raw else BODY
+
+
+def test_cancelled_caller_does_not_cancel_coalesced_ones(tmp_path):
+    async def check():
+        client = SlowClient(EdgeCache(str(tmp_path / "edges.sqlite")))
+        first = asyncio.ensure_future(client.relations_to("voler", 24))
+        second = asyncio.ensure_future(client.relations_to("voler", 24))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        edges = await second
+        return first.cancelled(), edges, client.calls, client._inflight
+
+    cancelled, edges, calls, inflight = asyncio.run(check())
+    assert cancelled and edges == [[1, "kiwi", 40]]
+    assert calls == 1 and not inflight
+
+
+class ScriptedClient(ApiClient):
+    """
+    ApiClient dont chaque tentative (_request) suit un scénario : un statut, une exception à lever,
+    ou (délai, statut) pour une réponse lente. Le dernier élément est répété.
+    """
+
+    def __init__(self, cache, script, **kwargs):
+        super().__init__(cache=cache, rate_limit=0, **kwargs)
+        self.script = list(script)
+
+    async def _request(self, url, endpoint, raw=False, etag=None, sent=None):
+        self.calls += 1
+        if sent is not None:
+            sent.set()
+        step = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(step, BaseException):
+            raise step
+        delay, status = step if isinstance(step, tuple) else (0, step)
+        await asyncio.sleep(delay)
+        if status != 200:
+            return status, None
+        return status, (json.dumps(BODY).encode(), None) if raw else BODY
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(api, "RETRY_BACKOFF", 0)
+
+
+def test_transient_statuses_are_retried(tmp_path, no_backoff):
+    client = ScriptedClient(EdgeCache(str(tmp_path / "edges.sqlite")), [503, 429, 200])
+    edges = asyncio.run(client.relations_from("kiwi", 24))
+    assert edges == [[2, "voler", 40]] and client.calls == 3
+
+
+def test_transient_failures_are_never_cached(tmp_path, no_backoff):
+    cache = EdgeCache(str(tmp_path / "edges.sqlite"))
+    client = ScriptedClient(cache, [503])
+    assert asyncio.run(client.relations_from("kiwi", 24)) is None
+    assert client.calls == client.retries + 1
+
+    client = ScriptedClient(cache, [asyncio.TimeoutError()])
+    with pytest.raises(TransientError):
+        asyncio.run(client.relations_to("voler", 24))
+    for direction, node in (("from", "kiwi"), ("to", "voler")):
+        assert cache.get(direction, node, 24) is None and cache.stale(direction, node, 24) is None
+
+    # Un 404 est une absence certaine : elle, est gardée
+    client = ScriptedClient(cache, [404])
+    assert asyncio.run(client.relations_from("inconnu", 24)) == []
+    assert cache.get("from", "inconnu", 24) == []
+
+
+def test_circuit_breaker_allows_one_trial():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0.05)
+    breaker.record(False)
+    assert breaker.allow() and not breaker.open
+    breaker.record(False)
+    assert breaker.open and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()        # Requête d'essai
+    assert not breaker.allow()    # Une seule à la fois
+    breaker.record(False)         # Échec de l'essai : rouvert pour une durée complète
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(True)
+    assert not breaker.open and breaker.allow() and breaker.allow()
+
+
+def test_open_breaker_rejects_without_request(tmp_path, no_backoff):
+    client = ScriptedClient(EdgeCache(str(tmp_path / "edges.sqlite")), [503], retries=0)
+
+    async def check():
+        for _ in range(BREAKER_THRESHOLD):
+            assert await client.relations_from("kiwi", 24) is None
+        calls = client.calls
+        with pytest.raises(TransientError):
+            await client.relations_from("kiwi", 24)
+        return calls
+
+    assert asyncio.run(check()) == client.calls == BREAKER_THRESHOLD
+
+
+def test_slow_request_is_hedged(tmp_path):
+    client = ScriptedClient(EdgeCache(str(tmp_path / "edges.sqlite")), [(2.0, 200), 200])
+    histogram = client._latencies["from"] = Histogram()
+    for _ in range(HEDGE_MIN_SAMPLES):
+        histogram.observe(0.01)
+    wins = metrics.counter("hedge_wins", endpoint="from")
+
+    start_time = time.monotonic()
+    edges = asyncio.run(client.relations_from("kiwi", 24))
+    assert edges == [[2, "voler", 40]] and client.calls == 2
+    assert time.monotonic() - start_time < 1.0
+    assert metrics.counter("hedge_wins", endpoint="from") == wins + 1
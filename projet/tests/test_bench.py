@@ -0,0 +1,29 @@
+import json
+import asyncio
+
+from bench.replay import load_fixtures
+from bench.run import benchmark, BASELINE_FILE, SCENARIOS
+
+
+class TrackedFixtures(dict):
+    """Fixtures qui notent les requêtes absentes (le ReplayServer leur répond 503)."""
+
+    def __init__(self, fixtures):
+        super().__init__(fixtures)
+        self.missing = set()
+
+    def get(self, key, default=None):
+        if key not in self:
+            self.missing.add(key)
+        return super().get(key, default)
+
+
+def test_replay_covers_corpus_within_baseline(corpus):
+    """Les fixtures livrées couvrent tout le corpus, sans dépasser les appels API de la référence."""
+    fixtures = TrackedFixtures(load_fixtures())
+    results = asyncio.run(benchmark(corpus, list(SCENARIOS), fixtures, 0.0, 0.0, 1, 8))
+    assert not fixtures.missing
+    with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    for name, measures in results.items():
+        assert measures["api_calls"] <= baseline[name]["api_calls"], name
@@ -0,0 +1,18 @@
+import random
+
+from utils.bloom import BloomFilter
+
+
+def test_no_false_negatives():
+    rng = random.Random(0)
+    items = [f"nœud {rng.random()}" for _ in range(5000)]
+    bloom = BloomFilter.from_items(items)
+    restored = BloomFilter.from_bytes(bloom.to_bytes())
+    assert all(item in bloom for item in items)
+    assert all(item in restored for item in items)
+
+
+def test_false_positive_rate():
+    bloom = BloomFilter.from_items(f"présent {i}" for i in range(2000))
+    false_positives = sum(f"absent {i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.03
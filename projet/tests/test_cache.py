@@ -0,0 +1,36 @@
+import time
+
+from utils import cache as cache_module
+from utils.cache import EdgeCache
+
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    cache = EdgeCache(str(tmp_path / "edges.sqlite"), ttl=0.2, negative_ttl=0.05)
+    cache.put("from", "kiwi", 6, [[1, "fruit", 40]])
+    cache.put("from", "kiwi", 24, [])
+    cache.put("to", "voler", 24, [[1, "kiwi", 10]], etag='"v1"')
+    assert cache.get("from", "kiwi", 6) == [[1, "fruit", 40]] and cache.get("from", "kiwi", 24) == []
+
+    time.sleep(0.08)  # Absences expirées (negative_ttl), le reste non
+    assert cache.get("from", "kiwi", 24) is None
+    assert cache.get("from", "kiwi", 6) == [[1, "fruit", 40]]
+    assert cache.contains("to", "voler", 24)
+
+    time.sleep(0.15)
+    assert cache.get("from", "kiwi", 6) is None and not cache.contains("to", "voler", 24)
+    # Une entrée expirée avec ETag reste disponible pour une revalidation conditionnelle
+    assert cache.get("to", "voler", 24) is None
+    assert cache.stale("to", "voler", 24) == ([[1, "kiwi", 10]], '"v1"')
+    assert cache.stale("from", "kiwi", 6) is None
+
+
+def test_eviction_keeps_recently_read_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "EVICTION_INTERVAL", 1)
+    cache = EdgeCache(str(tmp_path / "edges.sqlite"), max_entries=3)
+    cache.put("from", "n0", 6, [[0, "x", 1]])
+    for i in range(1, 6):
+        time.sleep(0.001)
+        assert cache.get("from", "n0", 6) is not None  # n0 reste la plus récemment lue
+        cache.put("from", f"n{i}", 6, [[i, "x", 1]])
+    kept = {node for _, node, _, _, _ in cache.entries()}
+    assert kept == {"n0", "n4", "n5"}
@@ -0,0 +1,48 @@
+import json
+import random
+
+import pytest
+
+from utils.decode import decode_edges, extract_edges
+
+NAMES = ["kiwi", "pomme de terre", "l'été", "œuf", 'guillemet "double"', "barre \\ oblique",
+         "ligne\nsuivante", "tab\tulation", "emoji 🥝", "été/hiver", " séparateur"]
+
+
+def payload(rng, count):
+    nodes = [{"id": 100 + i, "name": rng.choice(NAMES) + str(i), "type": 1, "w": rng.randint(-5, 50)}
+             for i in range(count)]
+    relations = []
+    for i in range(count * 2):
+        weight = rng.choice([rng.randint(-100, 500), round(rng.uniform(-10, 10), 3), 0, 25.0])
+        relation = {"id": i, "node1": rng.choice(nodes)["id"], "node2": rng.choice(nodes)["id"],
+                    "type": 6, "w": weight}
+        if rng.random() < 0.3:
+            relation = dict(reversed(list(relation.items())))
+        relations.append(relation)
+    data = {"nodes": nodes, "relations": relations}
+    if rng.random() < 0.5:
+        data = {"relations": relations, "nodes": nodes}
+    return data
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("end", ["node1", "node2"])
+def test_decode_matches_json(seed, end):
+    rng = random.Random(seed)
+    data = payload(rng, rng.randint(0, 40))
+    body = json.dumps(data, ensure_ascii=bool(seed % 2), indent=2 if seed % 3 == 0 else None).encode('utf-8')
+    assert decode_edges(body, end) == extract_edges(json.loads(body), end)
+
+
+def test_decode_falls_back_on_nested_objects():
+    data = {"nodes": [{"id": 1, "name": "a", "meta": {"id": 9, "name": "b"}}],
+            "relations": [{"id": 5, "node2": 1, "w": 3, "extra": {"node2": 7, "w": 1}}]}
+    body = json.dumps(data).encode('utf-8')
+    assert decode_edges(body, "node2") == extract_edges(data, "node2") == [[1, "a", 3]]
+
+
+def test_decode_empty_and_missing_arrays():
+    for data in ({"nodes": [], "relations": []}, {"relations": []}, {}):
+        body = json.dumps(data).encode('utf-8')
+        assert decode_edges(body, "node2") == extract_edges(data, "node2") == []
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+
+from batch import make_record
+from bench.replay import request_key
+from bench.synthetic import SyntheticGraph
+from inference.engine import InferenceEngine
+from inference.materialized import MaterializedIndex
+from materialize import materialize_pair
+from utils.api import ApiClient
+from utils.cache import EdgeCache
+from utils.intern import node_table
+from utils.relations import index_relation_types, load_relation_types
+from utils.snapshot import SnapshotSource
+
+
+def test_materialized_matches_live(corpus, snapshot_dir, tmp_path):
+    index = MaterializedIndex(str(tmp_path / "index.sqlite"))
+
+    async def check():
+        async with InferenceEngine(snapshot=snapshot_dir) as live, \
+                InferenceEngine(snapshot=snapshot_dir, index=index) as fast:
+            for node_a, relation in sorted({(node_a, relation) for _, node_a, relation, _ in corpus}):
+                entries, reads = await materialize_pair(live, node_a, relation)
+                index.store(node_a, relation, live.config, entries, reads)
+            hits = 0
+            for _, node_a, relation, node_b in corpus:
+                for top_k in (None, 3):
+                    expected = make_record(0, node_a, relation, node_b, await live.run(node_a, relation, node_b, top_k))
+                    outcome = await fast.run(node_a, relation, node_b, top_k)
+                    hits += "index" in outcome["times"]
+                    assert make_record(0, node_a, relation, node_b, outcome) == expected
+            return hits
+
+    try:
+        assert asyncio.run(check()) > 0
+    finally:
+        index.close()
+
+
+def test_stream_final_matches_evaluate(corpus, snapshot_dir):
+    async def check():
+        async with InferenceEngine(snapshot=snapshot_dir) as engine:
+            for _, node_a, relation, node_b in corpus:
+                expected = make_record(0, node_a, relation, node_b, await engine.run(node_a, relation, node_b, 10))
+                updates = [update async for update in engine.stream(node_a, relation, node_b, 10)]
+                assert updates[-1]["final"] and not any(update["final"] for update in updates[:-1])
+                assert make_record(0, node_a, relation, node_b, updates[-1]) == expected
+
+    asyncio.run(check())
+
+
+class GraphClient(ApiClient):
+    """ApiClient servi par un graphe synthétique modifiable, avec ETag (et 304) par réponse."""
+
+    def __init__(self, graph, cache):
+        super().__init__(cache=cache, rate_limit=0)
+        self.graph = graph
+
+    async def get_response(self, url, endpoint="other", raw=False, etag=None):
+        self.calls += 1
+        status, body = self.graph.get(request_key(url))
+        if status != 200:
+            return status, None
+        payload = json.dumps(body).encode()
+        tag = hashlib.sha1(payload).hexdigest()
+        if etag == tag:
+            return 304, None
+        return 200, (payload, tag) if raw else body
+
+
+def test_changed_neighbourhood_invalidates_memo(corpus, tmp_path):
+    _, node_a, relation, node_b = corpus[0]
+    graph = SyntheticGraph(corpus)
+    types = index_relation_types(load_relation_types())
+
+    async def check():
+        # Durée de vie nulle : chaque lecture revalide, seule la mémoire des préfixes peut masquer un changement
+        client = GraphClient(graph, EdgeCache(str(tmp_path / "edges.sqlite"), ttl=0))
+        engine = InferenceEngine(client=client)
+        before = make_record(0, node_a, relation, node_b, await engine.run(node_a, relation, node_b))
+        graph._add(node_a, "nouveau", types["r_isa"]["id"], 500)
+        graph._add("nouveau", node_b, types[relation]["id"], 80)
+        await client.relations_from(node_a, types["r_isa"]["id"], engine.paths.min_weight)  # Relecture (par ex. materialize --refresh)
+        after = make_record(0, node_a, relation, node_b, await engine.run(node_a, relation, node_b))
+        fresh_engine = InferenceEngine(client=GraphClient(graph, EdgeCache(str(tmp_path / "fresh.sqlite"))))
+        fresh = make_record(0, node_a, relation, node_b, await fresh_engine.run(node_a, relation, node_b))
+        return before, after, fresh
+
+    before, after, fresh = asyncio.run(check())
+    assert after == fresh and after != before
+
+
+class UnansweredLastHop(SnapshotSource):
+    """Instantané dont le dernier saut (liste entrante de node_b et appels par paire) reste sans réponse."""
+
+    def __init__(self, path, node_a):
+        super().__init__(path)
+        self.node_a = node_a
+
+    async def relations_to(self, node, type_id, min_weight=None):
+        return None
+
+    async def relations_between(self, node_a, node_b, type_id):
+        if node_a == self.node_a:  # Étape directe
+            return await super().relations_between(node_a, node_b, type_id)
+        return None
+
+
+def test_failed_reads_mark_outcome_incomplete(corpus, snapshot_dir):
+    _, node_a, relation, node_b = corpus[0]
+
+    async def check():
+        async with InferenceEngine(snapshot=snapshot_dir) as complete, \
+                InferenceEngine(client=UnansweredLastHop(snapshot_dir, node_a)) as failing:
+            expected = make_record(0, node_a, relation, node_b, await complete.run(node_a, relation, node_b))
+            record = make_record(0, node_a, relation, node_b, await failing.run(node_a, relation, node_b))
+            updates = [update async for update in failing.stream(node_a, relation, node_b, 10)]
+            return expected, record, updates[-1]
+
+    expected, record, final = asyncio.run(check())
+    assert not expected["incomplete"] and expected["candidates"]
+    assert record["incomplete"] and record["candidates"] == 0
+    assert final["results"].incomplete
+
+
+def test_node_table_released_between_queries(corpus, snapshot_dir, monkeypatch):
+    monkeypatch.setattr(node_table, "max_names", 10)
+
+    async def check():
+        async with InferenceEngine(snapshot=snapshot_dir) as engine:
+            records, generation = [], node_table.generation
+            for _, node_a, relation, node_b in corpus:
+                records.append(make_record(0, node_a, relation, node_b, await engine.run(node_a, relation, node_b, 10)))
+                updates = [update async for update in engine.stream(node_a, relation, node_b, 10)]
+                assert make_record(0, node_a, relation, node_b, updates[-1]) == records[-1]
+            # Table vidée à l'entrée de chaque requête (sauf peut-être la première) : 2 requêtes par triplet
+            assert node_table.generation - generation >= 2 * len(corpus) - 1
+            return records
+
+    released = asyncio.run(check())
+    monkeypatch.undo()
+
+    async def reference():
+        async with InferenceEngine(snapshot=snapshot_dir) as engine:
+            return [make_record(0, node_a, relation, node_b, await engine.run(node_a, relation, node_b, 10))
+                    for _, node_a, relation, node_b in corpus]
+
+    assert released == asyncio.run(reference())
@@ -0,0 +1,63 @@
+import asyncio
+
+from batch import make_record
+from inference.engine import InferenceEngine
+from inference.planner import QueryPlanner, MIN_FANOUT, EDGE_COST, SCAN_COST
+from utils.source import DataSource
+
+DEGREE = 20000
+
+
+class HubSource(DataSource):
+    """Source sans appel dont node_a est un hub de DEGREE arêtes (poids 1..DEGREE), en cache ou non."""
+
+    def __init__(self, cached=True, remote=False):
+        self.cached = cached
+        self.remote = remote
+
+    def is_local(self, direction, node, type_id, min_weight=None):
+        return self.cached
+
+    def local_weights(self, node, type_id, min_weight=None):
+        return list(range(1, DEGREE + 1)) if node == "hub" else None
+
+
+def planner(source, latency=0.2):
+    planner = QueryPlanner(source)
+    planner.call_latency = lambda: latency
+    return planner
+
+
+def test_plan_is_exhaustive_when_it_fits_or_when_unknown():
+    assert planner(HubSource()).plan("hub", 6, budget=10.0, node_b="voler", last_type=24).exhaustive
+    plan = planner(HubSource()).plan("inconnu", 6, budget=1e-6, node_b="voler", last_type=24)
+    assert plan.exhaustive and plan.min_weight == 1
+
+
+def test_cached_hub_keeps_the_strongest_edges_down_to_the_floor():
+    plan = planner(HubSource()).plan("hub", 6, budget=0.0, node_b="voler", last_type=24)
+    assert plan.max_fanout == MIN_FANOUT and not plan.upstream
+    assert plan.min_weight == DEGREE - MIN_FANOUT + 1
+    assert plan.estimated_seconds == DEGREE * SCAN_COST + MIN_FANOUT * EDGE_COST
+
+
+def test_uncached_hub_sends_the_threshold_upstream():
+    latency = 0.2
+    plan = planner(HubSource(cached=False, remote=True), latency).plan(
+        "hub", 6, budget=2 * latency + 0.01, node_b="voler", last_type=24)
+    # Deux appels (premier saut, dernier saut groupé), puis le reste du budget par arête gardée
+    assert plan.upstream and plan.max_fanout == int(0.01 / (EDGE_COST + SCAN_COST))
+    assert plan.min_weight == DEGREE - plan.max_fanout + 1
+
+
+def test_tight_budget_never_plans_empty_answers(corpus, snapshot_dir):
+    async def check():
+        async with InferenceEngine(snapshot=snapshot_dir) as engine:
+            for _, node_a, relation, node_b in corpus:
+                full = make_record(0, node_a, relation, node_b, await engine.run(node_a, relation, node_b))
+                planned = await engine.run(node_a, relation, node_b, budget=1e-9)
+                assert "plans" in planned
+                # Voisinages synthétiques sous MIN_FANOUT : le plan garde tout
+                assert make_record(0, node_a, relation, node_b, planned)["results"] == full["results"]
+
+    asyncio.run(check())
@@ -0,0 +1,50 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from inference.engine import InferenceEngine
+from server import InferenceServer
+from utils.api import TransientError
+from utils.snapshot import SnapshotSource
+
+
+class FailingSource(SnapshotSource):
+    """Instantané dont les relations sortantes échouent comme une API injoignable."""
+
+    async def relations_from(self, node, type_id, min_weight=None):
+        raise TransientError(f"requête échouée : {node}")
+
+
+def test_source_failure_is_json_error(corpus, snapshot_dir):
+    _, node_a, relation, node_b = corpus[0]
+
+    async def check():
+        engine = InferenceEngine(client=FailingSource(snapshot_dir))
+        async with TestClient(TestServer(InferenceServer(engine).app())) as client:
+            response = await client.get("/infer", params={"node_a": node_a, "relation": relation, "node_b": node_b})
+            return response.status, await response.json()
+
+    status, record = asyncio.run(check())
+    assert status == 503
+    assert record["node_a"] == node_a and record["results"] == []
+    assert "requête échouée" in record["error"]
+
+
+class UnansweredSource(SnapshotSource):
+    """Instantané dont les relations sortantes restent sans réponse (429/5xx après les nouvelles tentatives)."""
+
+    async def relations_from(self, node, type_id, min_weight=None):
+        return None
+
+
+def test_unanswered_first_hop_is_not_an_empty_result(corpus, snapshot_dir):
+    _, node_a, relation, node_b = corpus[0]
+
+    async def check():
+        engine = InferenceEngine(client=UnansweredSource(snapshot_dir))
+        async with TestClient(TestServer(InferenceServer(engine).app())) as client:
+            response = await client.get("/infer", params={"node_a": node_a, "relation": relation, "node_b": node_b})
+            return response.status, await response.json()
+
+    status, record = asyncio.run(check())
+    assert status == 502 and record["error"]
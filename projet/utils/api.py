@@ -1 +1,478 @@
+import random
+import asyncio
+import time
+import weakref
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from collections import OrderedDict
+
+from utils import metrics
+from utils.bloom import BloomFilter
+from utils.cache import EdgeCache
+from utils.decode import decode_edges, loads
+from utils.metrics import Histogram
+from utils.relations import relation_registry, update_registry
+from utils.source import DataSource, SourceError
+
 BASE_URL = "https://jdm-api.demo.lirmm.fr/v0"
+MAX_CONCURRENCY = 32   # Nombre maximal de requêtes HTTP simultanées (toutes étapes confondues)
+RATE_LIMIT = 20.0      # Requêtes par seconde et par hôte (None pour désactiver)
+ABSENT_STATUSES = {404}  # Statuts signifiant une absence certaine (et non une erreur transitoire)
+FILTER_MEMO_SIZE = 1024  # Filtres de Bloom gardés en mémoire par client
+REQUEST_TIMEOUT = 10.0   # Durée maximale (s) d'une tentative, connexion comprise
+CONNECT_TIMEOUT = 3.0    # Durée maximale (s) de l'établissement de la connexion
+MAX_RETRIES = 2          # Nouvelles tentatives après une erreur transitoire
+RETRY_BACKOFF = 0.2      # Attente de base (s) avant une nouvelle tentative, doublée à chaque essai
+RETRY_STATUSES = {429, 500, 502, 503, 504}  # Statuts transitoires : la requête est retentée
+BREAKER_THRESHOLD = 5    # Échecs consécutifs avant l'ouverture du disjoncteur d'un hôte
+BREAKER_RESET = 30.0     # Durée (s) d'ouverture du disjoncteur avant une requête d'essai
+HEDGE_QUANTILE = 0.95    # Requête doublée quand la réponse tarde au-delà de ce quantile de latence
+HEDGE_MIN_SAMPLES = 20   # Latences observées avant d'activer le doublement
+HEDGE_MIN_DELAY = 0.05   # Délai minimal (s) avant de doubler une requête
+
+try:
+    import brotli  # noqa: F401  (aiohttp décompresse alors les réponses « br »)
+    ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+_edge_cache = None
+
+
+def default_cache():
+    """Cache d'arêtes partagé par les clients du processus, ouvert (et créé sur disque) à la première demande."""
+    global _edge_cache
+    if _edge_cache is None:
+        _edge_cache = EdgeCache()
+    return _edge_cache
+
+
+class TransientError(SourceError):
+    """Échec transitoire de l'API (délai dépassé, erreur réseau, disjoncteur ouvert) après les nouvelles tentatives."""
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un hôte : après `threshold` échecs consécutifs, les requêtes échouent
+    immédiatement pendant `reset_timeout` secondes ; une seule requête d'essai passe ensuite,
+    et son issue referme ou rouvre le disjoncteur.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if self._trial or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        self._trial = True
+        return True
+
+    def record(self, success):
+        self._trial = False
+        if success:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Requête annulée sans issue : une autre requête d'essai pourra passer."""
+        self._trial = False
+
+
+class RateLimiter:
+    """Seau à jetons asynchrone : au plus `rate` acquisitions par seconde, par rafales de `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ApiClient(DataSource):
+    """
+    Client asynchrone unique de l'API JDM : un seul pool de connexions, une limite
+    globale de requêtes simultanées et une limitation de débit par hôte.
+    Toutes les lectures d'arêtes passent d'abord par le cache local.
+
+    Chaque tentative est bornée par `timeout` secondes. Les erreurs transitoires (réseau, délai,
+    statuts de RETRY_STATUSES) sont retentées au plus `retries` fois, après une attente aléatoire
+    (backoff exponentiel avec gigue), et alimentent un disjoncteur par hôte. Une requête qui
+    tarde au-delà du quantile `hedge_quantile` des latences observées est doublée ; la première
+    réponse l'emporte (hedge_quantile=None désactive le doublement).
+
+    À utiliser comme contexte asynchrone :
+        async with ApiClient() as client:
+            edges = await client.relations_from("kiwi", 6)
+    """
+
+    remote = True
+
+    def __init__(self, base_url=BASE_URL, cache=None, max_concurrency=MAX_CONCURRENCY, rate_limit=RATE_LIMIT,
+                 timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, hedge_quantile=HEDGE_QUANTILE):
+        self.base_url = base_url
+        self.cache = cache if cache is not None else default_cache()
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge_quantile = hedge_quantile
+        self.session = None
+        self._semaphore = None
+        self._limiters = {}
+        self._breakers = {}
+        self._latencies = {}  # Point d'accès -> Histogram des latences des réponses reçues
+        self._relation_types_lock = asyncio.Lock()
+        self._inflight = {}
+        self._filters = OrderedDict()  # (node_b, type) -> (BloomFilter ou None, date de construction ou de lecture)
+        self._watchers = []  # Références faibles vers les rappels de on_change
+        self.calls = 0
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300)
+            timeout = aiohttp.ClientTimeout(total=self.timeout, sock_connect=CONNECT_TIMEOUT)
+            # Transfert compressé demandé explicitement ; aiohttp décompresse à la lecture
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                                 headers={"Accept-Encoding": ACCEPT_ENCODING})
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _limiter(self, url):
+        if not self.rate_limit:
+            return None
+        host = urlsplit(url).netloc
+        if host not in self._limiters:
+            self._limiters[host] = RateLimiter(self.rate_limit)
+        return self._limiters[host]
+
+    def _breaker(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker()
+        return self._breakers[host]
+
+    def _hedge_delay(self, endpoint):
+        """Délai avant de doubler une requête (None tant que les latences observées sont trop peu nombreuses)."""
+        histogram = self._latencies.get(endpoint)
+        if self.hedge_quantile is None or histogram is None or histogram.count < HEDGE_MIN_SAMPLES:
+            return None
+        delay = histogram.quantile(self.hedge_quantile)
+        return max(HEDGE_MIN_DELAY, delay) if delay != float("inf") else None
+
+    async def get_json(self, url, endpoint="other"):
+        """Corps JSON d'une requête GET, ou None si le statut n'est pas 200."""
+        status, data = await self.get_response(url, endpoint)
+        return data if status == 200 else None
+
+    async def get_response(self, url, endpoint="other", raw=False, etag=None):
+        """
+        Requête GET résiliente ; retourne (statut, JSON), le JSON valant None si le statut n'est pas 200.
+        Avec `raw`, le corps est rendu tel quel (octets) pour être analysé par l'appelant, avec
+        l'ETag de la réponse : (statut, (corps, ETag ou None)). Avec `etag`, la requête est
+        conditionnelle (If-None-Match) et le statut 304 signale que la copie locale est à jour.
+
+        Les statuts transitoires et les erreurs réseau sont retentés (voir la classe) ; si le dernier
+        essai renvoie encore un statut transitoire, ce statut est retourné. Lève TransientError
+        si aucune réponse n'a pu être obtenue ou si le disjoncteur de l'hôte est ouvert.
+        """
+        breaker = self._breaker(url)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                metrics.inc("api_retries", endpoint=endpoint)
+                await asyncio.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** (attempt - 1)))
+            if not breaker.allow():
+                metrics.inc("circuit_rejections", endpoint=endpoint)
+                raise TransientError(f"disjoncteur ouvert pour {urlsplit(url).netloc}")
+            error = None
+            try:
+                status, data = await self._hedged(url, endpoint, raw, etag)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+                error = exc  # Erreur réseau, délai dépassé ou corps JSON tronqué
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                if status not in RETRY_STATUSES:
+                    breaker.record(True)
+                    return status, data
+            breaker.record(False)
+        if error is None:
+            return status, data
+        raise TransientError(f"requête échouée après {self.retries + 1} tentatives "
+                             f"({type(error).__name__}) : {url}") from error
+
+    async def _hedged(self, url, endpoint, raw=False, etag=None):
+        """
+        Tentative doublée si besoin : si la réponse tarde au-delà du délai de _hedge_delay, une
+        requête identique part en parallèle et la première réponse reçue est retenue. Le délai
+        court à partir de l'envoi effectif, après l'attente du sémaphore et du limiteur de débit.
+        """
+        sent = asyncio.Event()
+        tasks = [asyncio.ensure_future(self._request(url, endpoint, raw, etag, sent))]
+        delay = self._hedge_delay(endpoint)
+        try:
+            if delay is not None:
+                waiter = asyncio.ensure_future(sent.wait())
+                await asyncio.wait([tasks[0], waiter], return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    metrics.inc("hedged_requests", endpoint=endpoint)
+                    tasks.append(asyncio.ensure_future(self._request(url, endpoint, raw, etag)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            metrics.inc("hedge_wins", endpoint=endpoint)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _request(self, url, endpoint, raw=False, etag=None, sent=None):
+        """
+        Une requête GET bornée par le sémaphore global et le débit de l'hôte.
+        Chaque appel est compté par point d'accès et par statut, avec sa latence, les octets reçus
+        après décompression (api_bytes) et, si l'en-tête est présent, sur le réseau (api_wire_bytes).
+        L'attente du sémaphore et du limiteur de débit est mesurée à part.
+        """
+        limiter = self._limiter(url)
+        start_time = time.perf_counter()
+        async with self._semaphore:
+            if limiter is not None:
+                await limiter.acquire()
+            self.calls += 1
+            if sent is not None:
+                sent.set()
+            request_time = time.perf_counter()
+            metrics.observe("api_queue_seconds", request_time - start_time, endpoint=endpoint)
+            status = "error"
+            try:
+                headers = {"If-None-Match": etag} if etag is not None else None
+                async with self.session.get(url, headers=headers) as response:
+                    status = response.status
+                    body = await response.read()
+                    metrics.inc("api_bytes", len(body), endpoint=endpoint)
+                    if response.content_length is not None:
+                        metrics.inc("api_wire_bytes", response.content_length, endpoint=endpoint)
+                    self._latencies.setdefault(endpoint, Histogram()).observe(time.perf_counter() - request_time)
+                    if response.status != 200:
+                        return response.status, None
+                    if raw:
+                        return response.status, (body, response.headers.get("ETag"))
+                    return response.status, loads(body)
+            finally:
+                metrics.inc("api_requests", endpoint=endpoint, status=status)
+                metrics.observe("api_request_seconds", time.perf_counter() - request_time, endpoint=endpoint)
+
+    async def relation_types(self):
+        """
+        Index partagé des types de relations (utils.relations). L'API n'est interrogée que si
+        aucun fichier local n'existe ; la réponse est alors compilée pour les démarrages suivants.
+        """
+        relations_dict = relation_registry()
+        if relations_dict:
+            return relations_dict
+        async with self._relation_types_lock:  # Les étapes parallèles partagent le même appel
+            relations_dict = relation_registry()
+            if not relations_dict:
+                data = await self.get_json(f"{self.base_url}/relations_types", "relations_types")
+                if data is None:
+                    print("Erreur lors de la récupération des types de relations.")
+                    return {}
+                relations_dict = update_registry(data)
+        return relations_dict
+
+    async def _cached_fetch(self, url, end, direction, node, type_id, target=None, min_weight=None, on_fetch=None):
+        """
+        Lit le cache local d'abord ; sinon interroge l'API. Seules les réponses certaines sont
+        enregistrées : les voisinages reçus (une liste vide est une absence, gardée moins longtemps
+        par le cache) et le 404 de l'API (nœud inconnu), qui vaut un voisinage vide quel que soit le
+        point d'accès. Les autres statuts sont transitoires : ils retournent None ; les erreurs réseau
+        et les délais dépassés lèvent TransientError (voir get_response). Ni les uns ni les autres ne
+        sont mis en cache.
+
+        Une entrée expirée qui a un ETag est revalidée par une requête conditionnelle : sur un 304,
+        elle est reprise telle quelle, sans transfert ni décodage du voisinage.
+        `on_fetch(edges)` est appelé quand le voisinage vient de l'API (reçu ou revalidé), et non du cache.
+        """
+        edges = self.cache.get(direction, node, type_id, target, min_weight)
+        if edges is not None:
+            metrics.inc("cache_hits" if edges else "negative_cache_hits", direction=direction)
+            return edges
+        # Les requêtes simultanées sur la même entrée attendent le même appel HTTP, mené dans sa propre
+        # tâche : l'annulation d'un demandeur (celui qui l'a lancé compris) n'atteint pas les autres
+        key = (direction, node, target, type_id, min_weight)
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.inc("coalesced_requests", direction=direction)
+        else:
+            metrics.inc("cache_misses", direction=direction)
+            task = asyncio.ensure_future(
+                self._fetch(url, end, direction, node, type_id, target, min_weight, on_fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._fetched(key, done))
+        return await asyncio.shield(task)
+
+    def _fetched(self, key, task):
+        """Appel terminé : retiré des appels en cours (et son exception marquée comme lue, même sans demandeur)."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, url, end, direction, node, type_id, target, min_weight, on_fetch):
+        try:
+            stale = self.cache.stale(direction, node, type_id, target, min_weight)
+            # Corps brut : seuls les champs utiles sont lus (utils.decode), sans construire le document
+            status, data = await self.get_response(url, direction, raw=True,
+                                                   etag=stale[1] if stale is not None else None)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            metrics.inc("transient_failures", direction=direction)
+            raise
+        etag = None
+        if status == 304 and stale is not None:
+            metrics.inc("not_modified", direction=direction)
+            self.cache.revalidated(direction, node, type_id, target, min_weight)
+            edges = stale[0]
+        elif data is not None:
+            body, etag = data
+            edges = decode_edges(body, end)
+        elif status in ABSENT_STATUSES:
+            edges = []
+        else:
+            metrics.inc("transient_failures", direction=direction)
+            edges = None
+        if edges is not None and status != 304:
+            self.cache.put(direction, node, type_id, edges, target, min_weight, etag)
+            if stale is not None and edges != stale[0]:
+                metrics.inc("changed_neighbourhoods", direction=direction)
+                self._notify(direction, node, type_id)
+        if edges is not None and on_fetch is not None:
+            on_fetch(edges)
+        return edges
+
+    def on_change(self, callback):
+        # Référence faible : un moteur de chemins éphémère (inference.deductive, ...) ne reste pas abonné
+        self._watchers.append(weakref.WeakMethod(callback))
+
+    def _notify(self, direction, node, type_id):
+        self._watchers = [ref for ref in self._watchers if ref() is not None]
+        for ref in self._watchers:
+            callback = ref()
+            if callback is not None:
+                callback(direction, node, type_id)
+
+    def is_local(self, direction, node, type_id, min_weight=None):
+        return self.cache.contains(direction, node, type_id, min_weight=min_weight)
+
+    def local_weights(self, node, type_id, min_weight=None):
+        edges = self.cache.get("from", node, type_id, min_weight=min_weight)
+        return None if edges is None else [weight for _, _, weight in edges]
+
+    async def relations_from(self, node, type_id, min_weight=None):
+        """Relations sortantes de `node` pour un type donné, ou None si la requête échoue."""
+        url = f"{self.base_url}/relations/from/{node}?types_ids={type_id}"
+        if min_weight is not None:
+            url += f"&min_weight={min_weight}"
+        return await self._cached_fetch(url, "node2", "from", node, type_id, min_weight=min_weight)
+
+    async def relations_to(self, node, type_id, min_weight=None):
+        """Relations entrantes vers `node` pour un type donné, ou None si la requête échoue."""
+        url = f"{self.base_url}/relations/to/{node}?types_ids={type_id}"
+        if min_weight is not None:
+            url += f"&min_weight={min_weight}"
+            return await self._cached_fetch(url, "node1", "to", node, type_id, min_weight=min_weight)
+
+        # Liste entrante complète lue sur l'API (reçue ou revalidée) : son filtre de Bloom est
+        # reconstruit et remplace le précédent ; il n'est jamais tiré d'une copie en cache plus ancienne
+        def rebuild(edges):
+            bloom = BloomFilter.from_items(name for _, name, _ in edges)
+            now = time.time()
+            self.cache.put_filter(node, type_id, bloom.to_bytes(), now)
+            self._remember_filter(node, type_id, bloom, now)
+
+        return await self._cached_fetch(url, "node1", "to", node, type_id, on_fetch=rebuild)
+
+    def _remember_filter(self, node, type_id, bloom, fetched_at):
+        self._filters[(node, type_id)] = (bloom, fetched_at)
+        self._filters.move_to_end((node, type_id))
+        while len(self._filters) > FILTER_MEMO_SIZE:
+            self._filters.popitem(last=False)
+
+    def _filter(self, node, type_id):
+        """
+        Filtre de Bloom des sources entrantes de `node` (mémoire, puis cache local), ou None.
+        Ses réponses étant négatives, il expire après la durée de vie des absences (negative_ttl).
+        """
+        key = (node, type_id)
+        entry = self._filters.get(key)
+        if entry is not None and time.time() - entry[1] <= self.cache.negative_ttl:
+            self._filters.move_to_end(key)
+            return entry[0]
+        row = self.cache.get_filter(node, type_id)
+        if row is None:
+            self._remember_filter(node, type_id, None, time.time())
+            return None
+        bloom = BloomFilter.from_bytes(row[0])
+        self._remember_filter(node, type_id, bloom, row[1])
+        return bloom
+
+    async def relations_between(self, node_a, node_b, type_id):
+        """
+        Relations de `node_a` vers `node_b` pour un type donné, ou None si la requête échoue.
+        Si le filtre de Bloom des relations entrantes de node_b ne contient pas node_a,
+        la relation est certainement absente : aucune requête n'est envoyée.
+        """
+        bloom = self._filter(node_b, type_id)
+        if bloom is not None and node_a not in bloom:
+            metrics.inc("bloom_skips")
+            return []
+        url = f"{self.base_url}/relations/from/{node_a}/to/{node_b}?types_ids={type_id}"
+        return await self._cached_fetch(url, "node2", "between", node_a, type_id, target=node_b)
+
+
+def run_with_client(func, *args, **kwargs):
+    """Exécute `await func(client, *args, **kwargs)` avec un client ouvert pour l'occasion (usage synchrone)."""
+    async def runner():
+        async with ApiClient() as client:
+            return await func(client, *args, **kwargs)
+    return asyncio.run(runner())
@@ -0,0 +1,51 @@
+import math
+import hashlib
+
+FALSE_POSITIVE_RATE = 0.01
+
+
+class BloomFilter:
+    """
+    Filtre de Bloom : test d'appartenance compact, sans faux négatif. Un élément absent
+    du filtre est certainement absent de l'ensemble ; un élément présent l'est probablement
+    (taux de faux positifs `error_rate` pour `capacity` éléments).
+    """
+
+    def __init__(self, capacity, error_rate=FALSE_POSITIVE_RATE, bits=None, hashes=None):
+        capacity = max(1, capacity)
+        size = bits if bits is not None else max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.size = size
+        self.hashes = hashes or max(1, round(size / capacity * math.log(2)))
+        self.bits = bytearray((size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hachage (Kirsch-Mitzenmacher) à partir d'une seule empreinte blake2b
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @classmethod
+    def from_items(cls, items, error_rate=FALSE_POSITIVE_RATE):
+        items = list(items)
+        bloom = cls(len(items), error_rate)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def to_bytes(self):
+        """Sérialisation : taille (4 octets), nombre de hachages (1 octet), puis les bits."""
+        return self.size.to_bytes(4, 'little') + bytes([self.hashes]) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, raw):
+        bloom = cls(1, bits=int.from_bytes(raw[:4], 'little'), hashes=raw[4])
+        bloom.bits = bytearray(raw[5:])
+        return bloom
@@ -0,0 +1,225 @@
+import os
+import sqlite3
+import threading
+import time
+
+from utils.decode import dumps, loads
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_FILE = os.path.join(script_dir, 'data', 'edges.sqlite')
+
+DEFAULT_TTL = 7 * 24 * 3600      # Une semaine : les poids JDM évoluent lentement
+NEGATIVE_TTL = 24 * 3600         # Un jour pour les absences : une relation peut être créée entre-temps
+DEFAULT_MAX_ENTRIES = 200_000    # Au-delà, on évince les entrées les moins récemment lues
+EVICTION_INTERVAL = 1000         # Vérifier la taille toutes les N écritures
+
+
+class EdgeCache:
+    """
+    Cache persistant (SQLite) des voisinages récupérés sur l'API JDM.
+
+    Une entrée est indexée par (direction, nœud, cible, type de relation, poids minimal) :
+    - direction "from" / "to" : voisinage sortant / entrant de `node` (cible vide) ;
+    - direction "between" : relations de `node` vers `target`.
+    La valeur est la liste compacte [id, nom, poids] des nœuds à l'autre extrémité ; une
+    liste vide (absence de relation) est un résultat négatif, gardé `negative_ttl` secondes.
+    Une entrée expirée qui a un ETag est conservée : elle est revalidée par une requête
+    conditionnelle (voir stale et revalidated) au lieu d'être relue en entier.
+
+    Le cache conserve aussi, par (type, node_b), un filtre de Bloom des sources des relations
+    entrantes de node_b : une source absente du filtre n'a certainement pas de relation vers node_b.
+    Un filtre donnant des réponses négatives, il expire comme elles après `negative_ttl` secondes.
+    """
+
+    def __init__(self, path=CACHE_FILE, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, negative_ttl=NEGATIVE_TTL):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Une connexion par processus (chaque worker de batch.py ouvre la sienne), utilisée depuis la
+        # boucle asyncio ; le verrou ne sert que de garde si un appel venait d'un autre thread
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS edges (
+                direction TEXT NOT NULL,
+                node TEXT NOT NULL,
+                target TEXT NOT NULL,
+                type_id INTEGER NOT NULL,
+                min_weight TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                etag TEXT,
+                PRIMARY KEY (direction, node, target, type_id, min_weight)
+            )
+        """)
+        # Caches créés avant l'ajout des ETag
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(edges)")]
+        if "etag" not in columns:
+            self._conn.execute("ALTER TABLE edges ADD COLUMN etag TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS edges_accessed ON edges (accessed_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS filters (
+                node TEXT NOT NULL,
+                type_id INTEGER NOT NULL,
+                bits BLOB NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (node, type_id)
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _key(direction, node, type_id, target=None, min_weight=None):
+        return (direction, node, target or "", int(type_id), "" if min_weight is None else str(min_weight))
+
+    def get(self, direction, node, type_id, target=None, min_weight=None):
+        """Retourne la liste d'arêtes en cache, ou None si absente ou expirée."""
+        key = self._key(direction, node, type_id, target, min_weight)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, fetched_at, etag FROM edges "
+                "WHERE direction=? AND node=? AND target=? AND type_id=? AND min_weight=?",
+                key
+            ).fetchone()
+            if row is None:
+                return None
+            payload, fetched_at, etag = row
+            if now - fetched_at > (self.negative_ttl if payload == "[]" else self.ttl):
+                if etag is not None:
+                    return None  # Gardée pour une revalidation conditionnelle
+                self._conn.execute(
+                    "DELETE FROM edges WHERE direction=? AND node=? AND target=? AND type_id=? AND min_weight=?",
+                    key
+                )
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE edges SET accessed_at=? "
+                "WHERE direction=? AND node=? AND target=? AND type_id=? AND min_weight=?",
+                (now,) + key
+            )
+            self._conn.commit()
+        return loads(payload)
+
+    def contains(self, direction, node, type_id, target=None, min_weight=None):
+        """Vrai si une entrée non expirée existe (sans la lire ni la marquer comme lue)."""
+        key = self._key(direction, node, type_id, target, min_weight)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload = '[]', fetched_at FROM edges "
+                "WHERE direction=? AND node=? AND target=? AND type_id=? AND min_weight=?",
+                key
+            ).fetchone()
+        return row is not None and time.time() - row[1] <= (self.negative_ttl if row[0] else self.ttl)
+
+    def stale(self, direction, node, type_id, target=None, min_weight=None):
+        """(arêtes, ETag) d'une entrée, même expirée, qui peut être revalidée ; None sinon."""
+        key = self._key(direction, node, type_id, target, min_weight)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, etag FROM edges "
+                "WHERE direction=? AND node=? AND target=? AND type_id=? AND min_weight=? AND etag IS NOT NULL",
+                key
+            ).fetchone()
+        if row is None:
+            return None
+        return loads(row[0]), row[1]
+
+    def revalidated(self, direction, node, type_id, target=None, min_weight=None):
+        """Le serveur a confirmé l'entrée (304) : elle repart pour une durée de vie complète."""
+        key = self._key(direction, node, type_id, target, min_weight)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE edges SET fetched_at=?, accessed_at=? "
+                "WHERE direction=? AND node=? AND target=? AND type_id=? AND min_weight=?",
+                (now, now) + key
+            )
+            self._conn.commit()
+
+    def put(self, direction, node, type_id, edges, target=None, min_weight=None, etag=None):
+        """Enregistre (ou remplace) la liste d'arêtes d'un voisinage, avec l'ETag de la réponse s'il y en a un."""
+        key = self._key(direction, node, type_id, target, min_weight)
+        now = time.time()
+        payload = dumps(edges)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO edges "
+                "(direction, node, target, type_id, min_weight, payload, fetched_at, accessed_at, etag) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (payload, now, now, etag)
+            )
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """
+        Supprime les entrées expirées sans ETag puis, si besoin, les moins récemment lues (verrou déjà pris) :
+        les entrées revalidables ne partent qu'avec l'éviction par ancienneté de lecture.
+        """
+        self._conn.execute(
+            "DELETE FROM edges WHERE etag IS NULL AND (fetched_at < ? OR (payload = '[]' AND fetched_at < ?))",
+            (now - self.ttl, now - self.negative_ttl)
+        )
+        self._conn.execute("DELETE FROM filters WHERE fetched_at < ?", (now - self.negative_ttl,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM edges").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM edges WHERE rowid IN "
+                "(SELECT rowid FROM edges ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def get_filter(self, node, type_id):
+        """
+        Filtre de Bloom des sources entrantes de `node` : (octets sérialisés, date de construction),
+        ou None s'il est absent ou expiré.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT bits, fetched_at FROM filters WHERE node=? AND type_id=?", (node, int(type_id))
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.negative_ttl:
+            return None
+        return row
+
+    def put_filter(self, node, type_id, bits, fetched_at=None):
+        """Enregistre (ou remplace) le filtre de Bloom des sources entrantes de `node`."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO filters (node, type_id, bits, fetched_at) VALUES (?, ?, ?, ?)",
+                (node, int(type_id), bits, fetched_at or time.time())
+            )
+            self._conn.commit()
+
+    def entries(self):
+        """Itère sur toutes les entrées non expirées : (direction, nœud, cible, type, arêtes)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT direction, node, target, type_id, payload FROM edges WHERE fetched_at >= ?",
+                (time.time() - self.ttl,)
+            ).fetchall()
+        for direction, node, target, type_id, payload in rows:
+            yield direction, node, target, type_id, loads(payload)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM edges")
+            self._conn.execute("DELETE FROM filters")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
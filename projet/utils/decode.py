@@ -0,0 +1,100 @@
+import re
+import json
+
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle : analyseur JSON plus rapide
+    orjson = None
+
+# Champs lus dans une réponse /relations : les tableaux "nodes" et "relations" sont des listes
+# d'objets plats ; seuls id / name (nœuds) et node1 ou node2 / w (relations) sont utiles.
+NODES_ARRAY = re.compile(rb'"nodes"\s*:\s*\[')
+RELATIONS_ARRAY = re.compile(rb'"relations"\s*:\s*\[')
+NODE_ID = re.compile(rb'"id"\s*:\s*(-?\d+)')
+NODE_NAME = re.compile(rb'"name"\s*:\s*"([^"\\]*(?:\\.[^"\\]*)*)"')
+RELATION_END = {end: re.compile(rb'"' + end.encode() + rb'"\s*:\s*(-?\d+)') for end in ("node1", "node2")}
+RELATION_WEIGHT = re.compile(rb'"w"\s*:\s*(-?[0-9][0-9.eE+-]*)')
+DECIMAL_WEIGHT = re.compile(rb'"w"\s*:\s*-?[0-9]+[.eE]')
+NOT_BRACES = bytes(byte for byte in range(256) if byte not in b"{}")
+
+
+def loads(raw):
+    """json.loads, avec orjson quand il est installé."""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def dumps(obj):
+    """JSON compact (texte, caractères non ASCII conservés), avec orjson quand il est installé."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def extract_edges(data, end):
+    """
+    Réduit une réponse /relations déjà décodée à la liste [id, nom, poids] des nœuds situés
+    à l'extrémité `end` ("node1" pour les relations entrantes, "node2" pour les sortantes).
+    """
+    nodes_dict = {node["id"]: node["name"] for node in data.get("nodes", [])}
+    return [[rel.get(end), nodes_dict.get(rel.get(end), "Nom inconnu"), rel.get("w", 0)]
+            for rel in data.get("relations", [])]
+
+
+def _decode_names(names):
+    """Noms JSON bruts (sans guillemets) -> str ; un retour à la ligne ne peut figurer que sous forme échappée."""
+    decoded = b"\n".join(names).decode('utf-8').split("\n") if names else []
+    return [loads(f'"{name}"') if "\\" in name else name for name in decoded]
+
+
+def _number(raw):
+    """Nombre JSON brut -> int, ou float s'il a une partie décimale ou un exposant (comme json)."""
+    return float(raw) if b"." in raw or b"e" in raw or b"E" in raw else int(raw)
+
+
+def _flat_objects(section):
+    """
+    Nombre d'objets d'un tableau s'ils sont tous plats (accolades alternées, puis au plus la fin
+    du document), None sinon. Une accolade dans un nom ne fait que renvoyer, à tort mais sans
+    risque, à l'analyse complète.
+    """
+    braces = section.translate(None, NOT_BRACES)
+    count = braces.count(b"{")
+    return count if braces[:2 * count] == b"{}" * count else None
+
+
+def scan_edges(body, end):
+    """
+    Lecture directe d'une réponse /relations brute (octets), sans construire le document :
+    retourne la liste [id, nom, poids] des nœuds à l'extrémité `end`, construite directement
+    depuis les champs trouvés, ou None si la réponse n'a pas la forme attendue (il faut alors
+    l'analyser entièrement).
+    """
+    nodes_match = NODES_ARRAY.search(body)
+    relations_match = RELATIONS_ARRAY.search(body)
+    if relations_match is None:
+        return None
+    # Chaque tableau s'étend jusqu'au début de l'autre (ou jusqu'à la fin du document)
+    if nodes_match is None:
+        nodes, relations = b"", body[relations_match.end():]
+    elif nodes_match.start() < relations_match.start():
+        nodes, relations = body[nodes_match.end():relations_match.start()], body[relations_match.end():]
+    else:
+        nodes, relations = body[nodes_match.end():], body[relations_match.end():nodes_match.start()]
+
+    node_ids, node_names = NODE_ID.findall(nodes), NODE_NAME.findall(nodes)
+    ends, weights = RELATION_END[end].findall(relations), RELATION_WEIGHT.findall(relations)
+    # Un champ de chaque sorte par objet plat : sinon, objets imbriqués ou incomplets
+    if not len(node_ids) == len(node_names) == _flat_objects(nodes) or \
+            not len(ends) == len(weights) == _flat_objects(relations):
+        return None
+    names_by_id = dict(zip(node_ids, _decode_names(node_names)))
+    names = [names_by_id.get(node, "Nom inconnu") for node in ends]
+    # Conversion par colonne ; les poids ne passent par _number que si l'un d'eux est décimal
+    weights = list(map(_number if DECIMAL_WEIGHT.search(relations) else int, weights))
+    return list(map(list, zip(map(int, ends), names, weights)))
+
+
+def decode_edges(body, end):
+    """Liste [id, nom, poids] d'une réponse /relations brute (voir scan_edges, et extract_edges en repli)."""
+    edges = scan_edges(body, end)
+    return edges if edges is not None else extract_edges(loads(body), end)
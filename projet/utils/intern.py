@@ -0,0 +1,69 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+MAX_NAMES = 1_000_000  # Au-delà, la table est vidée à la prochaine requête seule en cours (~100 Mo de noms)
+
+
+class NodeTable:
+    """
+    Table d'internement des noms de nœuds, partagée par toutes les requêtes du processus :
+    chaque nom est stocké une seule fois et désigné ailleurs par un entier compact (int32).
+
+    Les identifiants ne valent que pour une génération de la table. Les requêtes la tiennent
+    « épinglée » (pinned) ; une requête qui l'épingle alors que rien d'autre ne l'est, et que la
+    table dépasse `max_names` noms, la vide d'abord et fait avancer sa génération. Un processus
+    longue durée (le serveur) ne garde ainsi pas tous les noms jamais rencontrés. Les résultats
+    d'une requête (CandidateSet) restent lisibles jusqu'au début de la suivante ; ce qui garde
+    des identifiants plus longtemps (mémoire des préfixes de PathInference) vérifie la génération.
+    """
+
+    def __init__(self, max_names=MAX_NAMES):
+        self._ids = {}
+        self._names = []
+        self._lock = threading.Lock()
+        self._pins = 0
+        self.max_names = max_names
+        self.generation = 0
+
+    @contextmanager
+    def pinned(self):
+        """Garde les identifiants valides pendant le bloc ; la table n'est vidée qu'à l'entrée d'un bloc."""
+        with self._lock:
+            if not self._pins and len(self._names) > self.max_names:
+                self._ids = {}
+                self._names = []
+                self.generation += 1
+            self._pins += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins -= 1
+
+    def intern(self, name):
+        node = self._ids.get(name)
+        if node is None:
+            with self._lock:
+                node = self._ids.get(name)
+                if node is None:
+                    node = self._ids[name] = len(self._names)
+                    self._names.append(name)
+        return node
+
+    def intern_many(self, names):
+        return np.fromiter((self.intern(name) for name in names), dtype=np.int32)
+
+    def name(self, node):
+        return self._names[node]
+
+    def names(self, nodes):
+        """Noms des identifiants `nodes` (les valeurs négatives, qui servent de bourrage, sont ignorées)."""
+        return [self._names[node] for node in nodes if node >= 0]
+
+    def __len__(self):
+        return len(self._names)
+
+
+node_table = NodeTable()
@@ -0,0 +1,166 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Bornes (en secondes) des histogrammes de latence, à la manière de Prometheus
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes (compte, somme, effectif par borne)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Dernière case : au-delà de la plus grande borne
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimation grossière d'un quantile (borne supérieure de la case qui le contient)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum, "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class Metrics:
+    """
+    Registre de compteurs et d'histogrammes, indexés par (nom, étiquettes).
+    Utilisé à la fois pour l'agrégat du processus et pour le rapport d'une requête.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        # Valeurs d'étiquettes en texte : un statut vaut 200 ou "error" sans gêner le tri des rapports
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def state(self):
+        """Copie brute (compteurs, histogrammes), transmissible à un autre processus."""
+        with self._lock:
+            return dict(self.counters), dict(self.histograms)
+
+    def merge(self, state):
+        """Ajoute l'état `state` (voir state()) d'un autre registre, par exemple celui d'un processus fils."""
+        counters, histograms = state
+        with self._lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, other in histograms.items():
+                histogram = self.histograms.setdefault(key, Histogram(other.buckets))
+                histogram.counts = [a + b for a, b in zip(histogram.counts, other.counts)]
+                histogram.count += other.count
+                histogram.sum += other.sum
+
+    def counter(self, name, **labels):
+        return self.counters.get(self._key(name, labels), 0)
+
+    def to_dict(self):
+        """Rapport lisible par une machine : {"counters": {...}, "histograms": {...}}."""
+        def label(name, labels):
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+        with self._lock:
+            report = {
+                "counters": {label(name, labels): value for (name, labels), value in sorted(self.counters.items())},
+                "histograms": {label(name, labels): histogram.to_dict()
+                               for (name, labels), histogram in sorted(self.histograms.items())},
+            }
+        hits = sum(v for (name, _), v in self.counters.items() if name == "cache_hits")
+        misses = sum(v for (name, _), v in self.counters.items() if name == "cache_misses")
+        report["cache_hit_ratio"] = hits / (hits + misses) if hits + misses else None
+        return report
+
+    def render_prometheus(self, prefix="jdm_"):
+        """Export au format texte de Prometheus."""
+        def label(labels, extra=()):
+            labels = list(labels) + list(extra)
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels) + "}"
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{prefix}{name}_total{label(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{prefix}{name}_bucket{label(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{prefix}{name}_bucket{label(labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{prefix}{name}_sum{label(labels)} {histogram.sum}")
+                lines.append(f"{prefix}{name}_count{label(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Agrégat du processus, et rapport de la requête en cours (propagé aux tâches asyncio filles)
+metrics = Metrics()
+current_report = ContextVar("current_report", default=None)
+
+
+def inc(name, value=1, **labels):
+    metrics.inc(name, value, **labels)
+    report = current_report.get()
+    if report is not None:
+        report.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    metrics.observe(name, value, **labels)
+    report = current_report.get()
+    if report is not None:
+        report.observe(name, value, **labels)
+
+
+@contextmanager
+def timer(stage):
+    """Mesure la durée d'une étape (histogramme stage_seconds{stage=...})."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_seconds", time.perf_counter() - start_time, stage=stage)
+
+
+@contextmanager
+def query_report(report=None):
+    """
+    Ouvre (ou rouvre) le rapport propre à une requête : les mesures prises dans le bloc, y compris
+    dans les tâches asyncio qui y sont créées, vont à la fois dans l'agrégat et dans ce rapport.
+    """
+    report = report if report is not None else Metrics()
+    token = current_report.set(report)
+    try:
+        yield report
+    finally:
+        current_report.reset(token)
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def normalize(values):
+    """Normalisation min-max vectorisée (1.0 partout si toutes les valeurs sont égales)."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return values
+    min_val = values.min()
+    diff = values.max() - min_val
+    if not diff:
+        return np.ones_like(values)
+    return (values - min_val) / diff
+
+
+def harmonic_scores(x, y):
+    """Moyenne harmonique terme à terme de deux tableaux de poids normalisés (0 là où x + y = 0)."""
+    total = x + y
+    return np.divide(2 * x * y, total, out=np.zeros_like(total), where=total > 0)
+
+
+def top_k_indices(scores, k):
+    """Indices des k meilleurs scores par ordre décroissant (tri partiel avec argpartition)."""
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind='stable')]
+
+
+def path_scores(norms):
+    """
+    Score de chemins : moyenne harmonique des poids normalisés de chaque saut
+    (`norms` a une ligne par chemin, une colonne par saut ; 0 si un poids est nul).
+    À deux sauts, c'est exactement harmonic_scores.
+    """
+    norms = np.asarray(norms, dtype=np.float64)
+    if norms.shape[1] == 2:
+        return harmonic_scores(norms[:, 0], norms[:, 1])
+    with np.errstate(divide='ignore'):
+        inverse_sum = np.sum(1.0 / norms, axis=1)
+    return np.where(np.all(norms > 0, axis=1), norms.shape[1] / inverse_sum, 0.0)
+
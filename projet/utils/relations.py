@@ -0,0 +1,64 @@
+import os
+import json
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RELATIONS_FILE = os.path.join(script_dir, 'data', 'relations.json')          # Export complet de l'API
+REGISTRY_FILE = os.path.join(script_dir, 'data', 'relation_types.json')      # Forme compacte [id, name, gpname]
+
+_registry = None
+
+
+def index_relation_types(rows):
+    """Index des types de relations par id, name et gpname à partir de lignes (id, name, gpname)."""
+    relations = [{"id": rel_id, "name": name, "gpname": gpname} for rel_id, name, gpname in rows]
+    relations_dict = {rel["id"]: rel for rel in relations}
+    relations_dict.update({rel["name"]: rel for rel in relations})
+    relations_dict.update({rel["gpname"]: rel for rel in relations})
+    return relations_dict
+
+
+def compile_relation_types(data, path=REGISTRY_FILE):
+    """
+    Réduit la liste complète des types (réponse de /relations_types) à ses colonnes utiles,
+    sans les textes d'aide, et l'écrit sous forme compacte. Retourne les lignes (id, name, gpname).
+    """
+    rows = [[rel["id"], rel["name"], rel["gpname"]] for rel in data]
+    try:
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, separators=(",", ":"))
+    except OSError as exc:
+        print(f"Impossible d'enregistrer les types de relations dans {path} : {exc}")
+    return rows
+
+
+def load_relation_types(path=REGISTRY_FILE, source=RELATIONS_FILE):
+    """
+    Lignes (id, name, gpname) des types de relations, lues depuis la forme compacte.
+    Celle-ci est (re)compilée depuis l'export complet s'il est plus récent ; liste vide si
+    aucun des deux fichiers n'existe (le client de l'API se charge alors de la requête).
+    """
+    if os.path.exists(source) and (not os.path.exists(path) or os.path.getmtime(source) > os.path.getmtime(path)):
+        with open(source, 'r', encoding='utf-8') as f:
+            return compile_relation_types(json.load(f), path)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def relation_registry():
+    """Index partagé des types de relations, construit au premier usage (aucun appel réseau)."""
+    global _registry
+    if _registry is None:
+        _registry = index_relation_types(load_relation_types())
+    return _registry
+
+
+def update_registry(data):
+    """Remplace l'index partagé par la liste complète `data` reçue de l'API, et l'enregistre."""
+    global _registry
+    _registry = index_relation_types(compile_relation_types(data))
+    return _registry
@@ -0,0 +1,255 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from array import array
+
+import numpy as np
+
+from utils.cache import EdgeCache, CACHE_FILE
+from utils.source import DataSource
+from utils.relations import index_relation_types, load_relation_types
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.path.join(script_dir, 'data', 'snapshot')
+
+# Format des dumps JDM : « eid=..|n="nom"|t=..|w=.. » pour les nœuds,
+# « rid=..|n1=..|n2=..|t=..|w=.. » pour les relations
+DUMP_NODE = re.compile(r'^eid=(\d+)\|n="(.*?)"\|t=(-?\d+)\|w=(-?[\d.]+)')
+DUMP_RELATION = re.compile(r'^rid=(\d+)\|n1=(\d+)\|n2=(\d+)\|t=(\d+)\|w=(-?[\d.]+)')
+
+
+class SnapshotBuilder:
+    """
+    Accumule des arêtes (depuis un dump JDM ou le cache d'arêtes) puis écrit un instantané :
+    noms internés en identifiants entiers (ordre lexicographique des octets UTF-8) et,
+    pour chaque type de relation et chaque sens, des tableaux CSR (offsets, cibles, poids).
+    """
+
+    def __init__(self):
+        self.node_index = {}        # nom -> identifiant provisoire
+        self.jdm_ids = array('q')   # identifiant JDM de chaque nœud (0 si inconnu)
+        self.edges = {}             # type -> (sources, cibles, poids)
+
+    def node(self, name, jdm_id=None):
+        index = self.node_index.get(name)
+        if index is None:
+            index = self.node_index[name] = len(self.jdm_ids)
+            self.jdm_ids.append(0)
+        if jdm_id and not self.jdm_ids[index]:
+            self.jdm_ids[index] = jdm_id
+        return index
+
+    def add(self, type_id, src, dst, weight, src_id=None, dst_id=None):
+        if type_id not in self.edges:
+            self.edges[type_id] = (array('q'), array('q'), array('d'))
+        sources, targets, weights = self.edges[type_id]
+        sources.append(self.node(src, src_id))
+        targets.append(self.node(dst, dst_id))
+        weights.append(weight)
+
+    def add_cache(self, cache):
+        """Ajoute toutes les arêtes accumulées dans le cache local (EdgeCache)."""
+        for direction, node, target, type_id, edges in cache.entries():
+            for node_id, name, weight in edges:
+                if direction == "to":
+                    self.add(type_id, name, node, weight, src_id=node_id)
+                else:
+                    self.add(type_id, node, name, weight, dst_id=node_id)
+
+    def add_dump(self, path, encoding='utf-8'):
+        """Ajoute un dump texte JDM (les nœuds doivent précéder les relations, comme dans les dumps officiels)."""
+        names = {}
+        with open(path, 'r', encoding=encoding, errors='replace') as f:
+            for line in f:
+                match = DUMP_RELATION.match(line)
+                if match:
+                    n1, n2 = int(match.group(2)), int(match.group(3))
+                    if n1 in names and n2 in names:
+                        self.add(int(match.group(4)), names[n1], names[n2], float(match.group(5)),
+                                 src_id=n1, dst_id=n2)
+                    continue
+                match = DUMP_NODE.match(line)
+                if match:
+                    names[int(match.group(1))] = match.group(2)
+
+    def write(self, out_dir, relation_types):
+        """Écrit l'instantané dans `out_dir` ; `relation_types` est la liste des lignes (id, name, gpname)."""
+        os.makedirs(out_dir, exist_ok=True)
+        names = sorted(self.node_index, key=lambda name: name.encode('utf-8'))
+        count = len(names)
+        # Renumérotation : identifiant provisoire -> rang dans l'ordre trié
+        rank = np.empty(count, dtype=np.int64)
+        rank[[self.node_index[name] for name in names]] = np.arange(count, dtype=np.int64)
+
+        encoded = [name.encode('utf-8') for name in names]
+        name_offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum([len(raw) for raw in encoded], out=name_offsets[1:])
+        np.save(os.path.join(out_dir, 'names.npy'), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        np.save(os.path.join(out_dir, 'name_offsets.npy'), name_offsets)
+
+        # Les nœuds sans identifiant JDM reçoivent un identifiant négatif stable dans l'instantané
+        jdm_ids = np.frombuffer(self.jdm_ids, dtype=np.int64)[np.argsort(rank)] if count else np.zeros(0, np.int64)
+        missing = jdm_ids == 0
+        jdm_ids = np.where(missing, -(np.arange(count, dtype=np.int64) + 1), jdm_ids)
+        np.save(os.path.join(out_dir, 'jdm_ids.npy'), jdm_ids)
+
+        index_dtype = np.int32 if count < 2 ** 31 else np.int64
+        for type_id, (sources, targets, weights) in self.edges.items():
+            sources = rank[np.frombuffer(sources, dtype=np.int64)]
+            targets = rank[np.frombuffer(targets, dtype=np.int64)]
+            weights = np.frombuffer(weights, dtype=np.float64)
+            for direction, keys, values in (("out", sources, targets), ("in", targets, sources)):
+                order = np.lexsort((values, keys))
+                keys, values, w = keys[order], values[order], weights[order]
+                # Une seule arête par couple (la première rencontrée)
+                keep = np.ones(len(keys), dtype=bool)
+                keep[1:] = (keys[1:] != keys[:-1]) | (values[1:] != values[:-1])
+                keys, values, w = keys[keep], values[keep], w[keep]
+                offsets = np.zeros(count + 1, dtype=np.int64)
+                np.cumsum(np.bincount(keys, minlength=count), out=offsets[1:])
+                prefix = os.path.join(out_dir, f"{direction}_{type_id}")
+                np.save(prefix + "_offsets.npy", offsets)
+                np.save(prefix + "_targets.npy", values.astype(index_dtype))
+                # Poids entiers (cas habituel de JDM) conservés en entiers, comme dans les réponses de l'API
+                np.save(prefix + "_weights.npy", w.astype(np.int64) if np.all(w == np.round(w)) else w)
+
+        with open(os.path.join(out_dir, 'relation_types.json'), 'w', encoding='utf-8') as f:
+            json.dump([list(row) for row in relation_types], f, ensure_ascii=False)
+        with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({"nodes": count, "types": sorted(self.edges), "built_at": time.time()}, f)
+
+
+class GraphSnapshot:
+    """
+    Instantané du graphe chargé en mémoire projetée (np.load(mmap_mode='r')) : plusieurs
+    processus partagent ainsi une seule copie via le cache de pages du système.
+    """
+
+    def __init__(self, path=SNAPSHOT_DIR):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, 'relation_types.json'), 'r', encoding='utf-8') as f:
+            self.relation_types = json.load(f)  # Lignes (id, name, gpname)
+        self.count = self.meta["nodes"]
+        self.names = self._load('names.npy')
+        self.name_offsets = self._load('name_offsets.npy')
+        self.jdm_ids = self._load('jdm_ids.npy')
+        self._csr = {}
+
+    def _load(self, filename):
+        return np.load(os.path.join(self.path, filename), mmap_mode='r')
+
+    def csr(self, direction, type_id):
+        """Tableaux (offsets, cibles, poids) d'un type et d'un sens, ou None si le type est absent."""
+        key = (direction, type_id)
+        if key not in self._csr:
+            prefix = f"{direction}_{type_id}"
+            if os.path.exists(os.path.join(self.path, prefix + "_offsets.npy")):
+                self._csr[key] = tuple(self._load(f"{prefix}_{part}.npy") for part in ("offsets", "targets", "weights"))
+            else:
+                self._csr[key] = None
+        return self._csr[key]
+
+    def name(self, index):
+        return self.names[self.name_offsets[index]:self.name_offsets[index + 1]].tobytes().decode('utf-8')
+
+    def lookup(self, name):
+        """Identifiant interne d'un nom (recherche dichotomique sur les noms triés), ou None."""
+        raw = name.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.names[self.name_offsets[mid]:self.name_offsets[mid + 1]].tobytes() < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.name(lo) == name:
+            return lo
+        return None
+
+    def neighbours(self, name, type_id, direction, min_weight=None):
+        """Liste [id JDM, nom, poids] des voisins de `name` dans le sens donné ("out" ou "in")."""
+        index = self.lookup(name)
+        arrays = self.csr(direction, type_id)
+        if index is None or arrays is None:
+            return []
+        offsets, targets, weights = arrays
+        start, end = offsets[index], offsets[index + 1]
+        targets, weights = targets[start:end], weights[start:end]
+        if min_weight is not None:
+            mask = weights >= min_weight
+            targets, weights = targets[mask], weights[mask]
+        return [[int(self.jdm_ids[target]), self.name(target), weight.item()]
+                for target, weight in zip(targets, weights)]
+
+    def between(self, name_a, name_b, type_id):
+        """Relation de `name_a` vers `name_b` (liste vide ou un seul élément)."""
+        index_a, index_b = self.lookup(name_a), self.lookup(name_b)
+        arrays = self.csr("out", type_id)
+        if index_a is None or index_b is None or arrays is None:
+            return []
+        offsets, targets, weights = arrays
+        start, end = offsets[index_a], offsets[index_a + 1]
+        # Les cibles de chaque nœud sont triées : recherche dichotomique
+        position = start + int(np.searchsorted(targets[start:end], index_b))
+        if position < end and targets[position] == index_b:
+            return [[int(self.jdm_ids[index_b]), name_b, weights[position].item()]]
+        return []
+
+
+class SnapshotSource(DataSource):
+    """Source de données hors ligne : répond aux inférences à partir d'un GraphSnapshot, sans réseau."""
+
+    def __init__(self, path=SNAPSHOT_DIR):
+        self.snapshot = GraphSnapshot(path)
+        self._relation_types = index_relation_types(self.snapshot.relation_types)
+
+    async def relation_types(self):
+        return self._relation_types
+
+    async def relations_from(self, node, type_id, min_weight=None):
+        return self.snapshot.neighbours(node, type_id, "out", min_weight)
+
+    async def relations_to(self, node, type_id, min_weight=None):
+        return self.snapshot.neighbours(node, type_id, "in", min_weight)
+
+    def local_weights(self, node, type_id, min_weight=None):
+        # Lecture directe des poids dans les tableaux CSR, sans construire la liste des voisins
+        index = self.snapshot.lookup(node)
+        arrays = self.snapshot.csr("out", type_id)
+        if index is None or arrays is None:
+            return []
+        offsets, _, weights = arrays
+        weights = weights[offsets[index]:offsets[index + 1]]
+        return weights if min_weight is None else weights[weights >= min_weight]
+
+    async def relations_between(self, node_a, node_b, type_id):
+        return self.snapshot.between(node_a, node_b, type_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construit un instantané local du graphe JDM.")
+    parser.add_argument("--dump", help="dump texte JDM à ingérer")
+    parser.add_argument("--encoding", default="utf-8", help="encodage du dump")
+    parser.add_argument("--cache", nargs="?", const=CACHE_FILE,
+                        help="ingérer aussi le cache d'arêtes local (chemin optionnel)")
+    parser.add_argument("-o", "--output", default=SNAPSHOT_DIR, help="dossier de l'instantané")
+    args = parser.parse_args(argv)
+    if not args.dump and not args.cache:
+        parser.error("indiquer --dump et/ou --cache")
+
+    builder = SnapshotBuilder()
+    if args.dump:
+        builder.add_dump(args.dump, args.encoding)
+    if args.cache:
+        builder.add_cache(EdgeCache(args.cache))
+    builder.write(args.output, load_relation_types())
+    print(f"Instantané écrit dans {args.output} ({len(builder.node_index)} nœuds)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
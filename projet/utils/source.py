@@ -0,0 +1,116 @@
+import asyncio
+from utils import metrics
+from utils.relations import relation_registry
+
+
+class SourceError(Exception):
+    """La source n'a pas pu répondre (erreur transitoire) : à ne pas confondre avec une relation absente."""
+
+
+class DataSource:
+    """
+    Interface commune des sources de données utilisées par les inférences
+    (API JDM en ligne, instantané local du graphe, ...).
+
+    Les voisinages sont des listes [id, nom, poids] des nœuds situés à l'autre extrémité.
+    Une méthode retourne None quand la source n'a pas pu répondre (erreur), et une
+    liste vide quand la relation n'existe pas.
+    """
+
+    calls = 0       # Nombre d'appels réseau effectués (0 pour une source locale)
+    remote = False  # Source interrogée par le réseau (coût de latence par appel)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def relation_types(self):
+        """Types de relations indexés par id, nom et gpname (index partagé, chargé au premier usage)."""
+        return relation_registry()
+
+    async def relations_from(self, node, type_id, min_weight=None):
+        """Relations sortantes de `node` pour un type donné."""
+        raise NotImplementedError
+
+    async def relations_to(self, node, type_id, min_weight=None):
+        """Relations entrantes vers `node` pour un type donné."""
+        raise NotImplementedError
+
+    async def relations_between(self, node_a, node_b, type_id):
+        """Relations de `node_a` vers `node_b` pour un type donné."""
+        raise NotImplementedError
+
+    def is_local(self, direction, node, type_id, min_weight=None):
+        """Vrai si le voisinage ("from" ou "to") se lit sans appel réseau (cache, instantané)."""
+        return not self.remote
+
+    def on_change(self, callback):
+        """
+        Abonne `callback(direction, node, type_id)` aux voisinages relus et trouvés changés, pour
+        invalider les mémoires qui en dérivent. Une source figée (instantané) ne change jamais.
+        """
+
+    def local_weights(self, node, type_id, min_weight=None):
+        """
+        Poids des relations sortantes de `node` s'ils sont connus localement (cache, instantané),
+        sans aucun appel réseau ; None sinon. Sert aux statistiques du planificateur de requêtes.
+        """
+        return None
+
+    async def relation_weight(self, node_a, node_b, type_id):
+        """
+        Poids de la première relation de `node_a` vers `node_b`, ou None si elle n'existe pas.
+        Lève SourceError si la source n'a pas pu répondre.
+        """
+        edges = await self.relations_between(node_a, node_b, type_id)
+        if edges is None:
+            raise SourceError(f"relation {node_a} -> {node_b} (type {type_id}) inconnue : requête échouée")
+        if edges:
+            return edges[0][2]
+        return None
+
+    async def incoming_weights(self, node_b, type_id):
+        """Dictionnaire id -> poids des relations entrantes de `node_b` (un seul appel), ou None si échec."""
+        incoming = await self.relations_to(node_b, type_id)
+        if incoming is None:
+            return None
+        weights_by_id = {}
+        for node_id, _, weight in incoming:
+            weights_by_id.setdefault(node_id, weight)
+        return weights_by_id
+
+    async def relation_weights(self, nodes, node_b, type_id):
+        """
+        Poids de la relation de chaque nœud (id, nom) de `nodes` vers `node_b` (None si absente),
+        et nombre de poids inconnus (requêtes par paire échouées, voir pair_weights).
+
+        Les relations entrantes de `node_b` sont chargées en une fois (incoming_weights) puis
+        croisées en mémoire avec `nodes` ; la liste entrante fait foi pour les nœuds absents.
+        On ne revient aux appels par paire que si ce chargement groupé échoue.
+        """
+        weights_by_id = await self.incoming_weights(node_b, type_id)
+        if weights_by_id is not None:
+            return [weights_by_id.get(node_id) for node_id, _ in nodes], 0
+        return await self.pair_weights([name for _, name in nodes], node_b, type_id)
+
+    async def pair_weights(self, names, node_b, type_id):
+        """
+        Poids de la relation de chaque nœud de `names` vers `node_b`, un appel par paire (None si absente),
+        et nombre de paires dont la requête a échoué : elles valent aussi None, mais sont comptées à part.
+        """
+        weights = await asyncio.gather(*(
+            self.relation_weight(name, node_b, type_id) for name in names
+        ), return_exceptions=True)
+        failed = sum(isinstance(weight, Exception) for weight in weights)
+        if failed:
+            metrics.inc("unknown_edges", failed)
+        return [None if isinstance(weight, Exception) else weight for weight in weights], failed